@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -79,6 +80,9 @@ CORS_ALLOWED_ORIGINS = [
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 
+from corsheaders.defaults import default_headers
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
 ROOT_URLCONF = 'expense_tracker.urls'
 
 TEMPLATES = [
@@ -132,6 +136,32 @@ if not DEBUG and DATABASES['default'].get('ENGINE') == 'django.db.backends.postg
     DATABASES['default']['OPTIONS'] = {'sslmode': 'require'}
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# The stats cache is file-based by default so gunicorn workers and the
+# management-command workers share one set of generation counters. Point
+# STATS_CACHE_BACKEND at the DB cache (after `createcachetable`) or LocMem
+# for single-process setups.
+
+STATS_CACHE_ALIAS = 'stats'
+STATS_CACHE_TIMEOUT = int(os.environ.get('STATS_CACHE_TIMEOUT', 24 * 60 * 60))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    STATS_CACHE_ALIAS: {
+        'BACKEND': os.environ.get('STATS_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('STATS_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'tracknest-stats-cache')),
+        'TIMEOUT': STATS_CACHE_TIMEOUT,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('STATS_CACHE_MAX_ENTRIES', 5000)),
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -179,6 +209,62 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Transactions list pagination is opt-in per request (cursor/page_size);
+# flip this once every client understands the paginated envelope
+TRANSACTIONS_PAGINATE_BY_DEFAULT = os.environ.get('TRANSACTIONS_PAGINATE_BY_DEFAULT', 'False') == 'True'
+
+# Statement uploads are parsed by `manage.py process_import_jobs`; with
+# eager mode on they are processed inside the upload request instead, for
+# setups that don't run the worker
+IMPORT_JOBS_EAGER = os.environ.get('IMPORT_JOBS_EAGER', 'False') == 'True'
+
+# sms_webhook stores payloads for `manage.py process_sms_inbox` and answers
+# 202; with eager mode on each SMS is logged inside the webhook request
+SMS_INBOX_EAGER = os.environ.get('SMS_INBOX_EAGER', 'False') == 'True'
+
+# Responses to requests sent with an Idempotency-Key are replayed for this
+# long (seconds); `manage.py prune_idempotency_keys` removes older keys
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+# Processes used to extract statement pages in parallel; 1 parses serially
+STATEMENT_PARSE_WORKERS = int(os.environ.get('STATEMENT_PARSE_WORKERS', 1))
+
+# Read statement tables from the text layer using the header's column
+# positions, falling back to pdfplumber's extract_table per page. Opt-in:
+# the speedup (benchmark_statement_parser) varies between runs and has
+# only been measured on generated statements
+STATEMENT_FAST_EXTRACT = os.environ.get('STATEMENT_FAST_EXTRACT', 'False') == 'True'
+
+# Statement uploads are spooled to disk and parsed page by page, so these
+# caps only guard CPU time, not memory. The spool directory must be shared
+# by the web process and the import worker.
+STATEMENT_MAX_UPLOAD_MB = int(os.environ.get('STATEMENT_MAX_UPLOAD_MB', 50))
+STATEMENT_MAX_PAGES = int(os.environ.get('STATEMENT_MAX_PAGES', 500))
+IMPORT_SPOOL_DIR = os.environ.get('IMPORT_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'tracknest-imports'))
+
+# Parsed statements are kept this long (seconds) for previews and re-uploads
+STATEMENT_STAGING_TTL = int(os.environ.get('STATEMENT_STAGING_TTL', 24 * 60 * 60))
+
+# Learned merchant categories kept in each process's LRU
+MERCHANT_CACHE_SIZE = int(os.environ.get('MERCHANT_CACHE_SIZE', 10000))
+
+# App logs (worker failures, parsing fallbacks) go to stderr with their
+# level and logger name, so the web and worker processes' output can be
+# told apart and filtered
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'app': {'format': '{asctime} {levelname} {name}: {message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'app'},
+    },
+    'loggers': {
+        'expenses': {'handlers': ['console'], 'level': os.environ.get('EXPENSES_LOG_LEVEL', 'INFO')},
+    },
+}
+
 from datetime import timedelta
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=90),
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PaymentMethod, Category, Transaction
+from .models import PaymentMethod, Category, CategoryRule, SmsInbox, Transaction
 
 @admin.register(PaymentMethod)
 class PaymentMethodAdmin(admin.ModelAdmin):
@@ -9,8 +9,19 @@ class PaymentMethodAdmin(admin.ModelAdmin):
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'is_income')
 
+@admin.register(CategoryRule)
+class CategoryRuleAdmin(admin.ModelAdmin):
+    list_display = ('keyword', 'category', 'priority', 'whole_word', 'transaction_type', 'is_active')
+    list_filter = ('category', 'is_active')
+    search_fields = ('keyword',)
+
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ('title', 'amount', 'category', 'payment_method', 'date')
     list_filter = ('category', 'payment_method', 'date')
     search_fields = ('title', 'description')
+
+@admin.register(SmsInbox)
+class SmsInboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'attempts', 'received_at', 'processed_at', 'last_error')
+    list_filter = ('status',)
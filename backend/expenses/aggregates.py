@@ -0,0 +1,203 @@
+from datetime import date, timedelta
+
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek, TruncYear
+from django.utils import timezone
+
+from .models import DailyRollup
+
+WEEK_DAYS = 7
+
+# Rollup days are already local (Asia/Kolkata) calendar days, so truncating
+# the DateField gives calendar-correct buckets without any tz conversion.
+GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'year': TruncYear,
+}
+
+SPLITS = {
+    'category': 'category__name',
+    'payment_method': 'payment_method__name',
+}
+
+MAX_BUCKETS = 400
+
+# Preset ranges ending today: (unit, how many units back including the current one)
+RANGES = {
+    '7d': ('day', 7),
+    '30d': ('day', 30),
+    '90d': ('day', 90),
+    '6m': ('month', 6),
+    '12m': ('month', 12),
+    '5y': ('year', 5),
+}
+
+
+def month_change(opening_balance, current_balance):
+    """Percentage change of the balance since the start of the month."""
+    # If opening balance is 0, any positive balance is 100% growth
+    if opening_balance == 0:
+        if current_balance > 0:
+            return 100
+        elif current_balance < 0:
+            return -100
+        else:
+            return 0
+
+    change = ((current_balance - opening_balance) / abs(opening_balance)) * 100
+    return round(change, 1)
+
+
+def summarize(user, today=None):
+    """
+    Computes every headline number of the dashboard in one conditional
+    aggregate over the user's daily rollups: lifetime income/expense and
+    balance, the opening balance of the current month, month-to-date
+    expense, the expense count and the last seven days of spending.
+    """
+    today = today or timezone.localdate()
+    first_of_month = today.replace(day=1)
+    week_start = today - timedelta(days=WEEK_DAYS - 1)
+
+    income = Q(transaction_type='income')
+    expense = Q(transaction_type='expense')
+    before_month = Q(day__lt=first_of_month)
+
+    aggregates = {
+        'income': Sum('total', filter=income),
+        'expense': Sum('total', filter=expense),
+        'opening_income': Sum('total', filter=income & before_month),
+        'opening_expense': Sum('total', filter=expense & before_month),
+        'month_expense': Sum('total', filter=expense & ~before_month),
+        'expense_count': Sum('count', filter=expense),
+    }
+    for offset in range(WEEK_DAYS):
+        day = week_start + timedelta(days=offset)
+        aggregates[f'day_{offset}'] = Sum('total', filter=expense & Q(day=day))
+
+    totals = DailyRollup.objects.filter(user=user).aggregate(**aggregates)
+    totals = {key: value or 0 for key, value in totals.items()}
+
+    balance = totals['income'] - totals['expense']
+    opening_balance = totals['opening_income'] - totals['opening_expense']
+
+    return {
+        'income': totals['income'],
+        'expense': totals['expense'],
+        'balance': balance,
+        'opening_balance': opening_balance,
+        'month_change': month_change(opening_balance, balance),
+        'month_expense': totals['month_expense'],
+        'expense_count': totals['expense_count'],
+        'weekly_spending': [
+            (week_start + timedelta(days=offset), totals[f'day_{offset}'])
+            for offset in range(WEEK_DAYS)
+        ],
+    }
+
+
+def add_months(day, months):
+    """First day of the month `months` away from `day`'s month."""
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def category_spend(user, start, end):
+    """Expense per category id between two local days, in one grouped query."""
+    rows = (
+        DailyRollup.objects
+        .filter(user=user, transaction_type='expense', day__gte=start, day__lte=end)
+        .values('category_id')
+        .annotate(spent=Sum('total'))
+        .order_by()
+    )
+    return {row['category_id']: row['spent'] for row in rows}
+
+
+def range_start(range_key, today):
+    unit, count = RANGES[range_key]
+    if unit == 'month':
+        return add_months(today, -(count - 1))
+    if unit == 'year':
+        return date(today.year - (count - 1), 1, 1)
+    return today - timedelta(days=count - 1)
+
+
+def bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def next_bucket(day, granularity):
+    if granularity == 'week':
+        return day + timedelta(days=WEEK_DAYS)
+    if granularity == 'month':
+        return add_months(day, 1)
+    if granularity == 'year':
+        return day.replace(year=day.year + 1)
+    return day + timedelta(days=1)
+
+
+def bucket_count(start, end, granularity):
+    """How many buckets bucket_starts would return, without building them."""
+    if granularity == 'week':
+        return (end - bucket_start(start, granularity)).days // WEEK_DAYS + 1
+    if granularity == 'month':
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    if granularity == 'year':
+        return end.year - start.year + 1
+    return (end - start).days + 1
+
+
+def bucket_starts(start, end, granularity):
+    buckets = []
+    current = bucket_start(start, granularity)
+    while current <= end:
+        buckets.append(current)
+        try:
+            current = next_bucket(current, granularity)
+        except (OverflowError, ValueError):
+            break # The last bucket of the calendar (year 9999)
+    return buckets
+
+
+def time_series(user, start, end, granularity='month', transaction_type='expense', split=None):
+    """
+    Sums the user's rollups between `start` and `end` (inclusive local days)
+    into calendar buckets grouped in the database. Every bucket in the range
+    is present, gaps are zero-filled, and with `split` each bucket also
+    carries a breakdown by category or payment method name.
+    """
+    buckets = bucket_starts(start, end, granularity)
+    split_field = SPLITS.get(split)
+
+    group_by = ['bucket', split_field] if split_field else ['bucket']
+    rows = (
+        DailyRollup.objects
+        .filter(user=user, transaction_type=transaction_type, day__gte=start, day__lte=end)
+        .annotate(bucket=GRANULARITIES[granularity]('day'))
+        .values(*group_by)
+        .annotate(amount=Sum('total'), count=Sum('count'))
+        .order_by('bucket')
+    )
+
+    series = {
+        bucket: {'period': bucket, 'amount': 0, 'count': 0, 'split': {}}
+        for bucket in buckets
+    }
+    for row in rows:
+        entry = series[row['bucket']]
+        entry['amount'] += row['amount']
+        entry['count'] += row['count']
+        if split_field:
+            name = row[split_field] or 'Uncategorized'
+            entry['split'][name] = entry['split'].get(name, 0) + row['amount']
+
+    return [series[bucket] for bucket in buckets]
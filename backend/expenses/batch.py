@@ -0,0 +1,120 @@
+"""
+Batch create/update/delete for transactions.
+
+All operations are validated through TransactionSerializer first. If any of
+them is invalid nothing is written; otherwise creates go through one
+bulk_create, updates through one bulk_update and deletes through one
+DELETE, inside a single database transaction, followed by one ledger call
+(and therefore one budget evaluation) for the whole batch.
+"""
+import copy
+
+from django.db import transaction as db_transaction
+
+from . import ledger, merchants
+from .models import Transaction
+from .serializers import TransactionSerializer
+
+MAX_OPERATIONS = 500
+
+OPERATIONS = ('create', 'update', 'delete')
+
+
+class BatchError(Exception):
+    """The request body itself is malformed (not a per-item problem)."""
+
+
+def _operations(payload):
+    operations = payload.get('operations') if isinstance(payload, dict) else None
+    if not isinstance(operations, list) or not operations:
+        raise BatchError('Provide a non-empty "operations" list')
+    if len(operations) > MAX_OPERATIONS:
+        raise BatchError(f'A batch can hold at most {MAX_OPERATIONS} operations')
+    return operations
+
+
+def apply_batch(user, payload, context=None):
+    """
+    Returns (applied, results) where results holds one entry per operation,
+    in request order.
+    """
+    operations = _operations(payload)
+    results = [{'index': index} for index in range(len(operations))]
+
+    creates, updates, deletes = [], [], []
+    seen_ids = set()
+    for index, operation in enumerate(operations):
+        result = results[index]
+        op = operation.get('op') if isinstance(operation, dict) else None
+        result['op'] = op
+        if op not in OPERATIONS:
+            result.update(status='error', errors={'op': [f"Expected one of: {', '.join(OPERATIONS)}"]})
+            continue
+        if op == 'create':
+            creates.append((index, operation.get('data') or {}))
+            continue
+        pk = operation.get('id')
+        if not isinstance(pk, int) or pk in seen_ids:
+            result.update(status='error', errors={'id': ['Expected a unique transaction id per batch']})
+            continue
+        seen_ids.add(pk)
+        (updates if op == 'update' else deletes).append((index, pk, operation.get('data') or {}))
+
+    existing = Transaction.objects.filter(user=user).in_bulk(list(seen_ids))
+
+    # Creates are validated together, as one many=True serializer
+    create_serializer = TransactionSerializer(data=[data for _, data in creates], many=True, context=context)
+    create_serializer.is_valid()
+    create_errors = create_serializer.errors if create_serializer.errors else [{}] * len(creates)
+    for (index, _), errors in zip(creates, create_errors):
+        if errors:
+            results[index].update(status='error', errors=errors)
+
+    updated = []
+    for index, pk, data in updates:
+        instance = existing.get(pk)
+        if instance is None:
+            results[index].update(status='error', errors={'id': ['Transaction not found']})
+            continue
+        serializer = TransactionSerializer(instance, data=data, partial=True, context=context)
+        if not serializer.is_valid():
+            results[index].update(status='error', errors=serializer.errors)
+            continue
+        updated.append((index, instance, serializer.validated_data))
+
+    for index, pk, _ in deletes:
+        if pk not in existing:
+            results[index].update(status='error', errors={'id': ['Transaction not found']})
+
+    if any(result.get('status') == 'error' for result in results):
+        for result in results:
+            result.setdefault('status', 'not_applied')
+        return False, results
+
+    with db_transaction.atomic():
+        created = Transaction.objects.bulk_create([
+            Transaction(user=user, **validated) for validated in create_serializer.validated_data
+        ])
+        for (index, _), txn in zip(creates, created):
+            results[index].update(status='created', id=txn.pk)
+
+        before, after, fields = [], [], set()
+        for index, instance, validated in updated:
+            before.append(copy.copy(instance))
+            for field, value in validated.items():
+                setattr(instance, field, value)
+                fields.add(field)
+            after.append(instance)
+            results[index].update(status='updated', id=instance.pk)
+        if fields:
+            Transaction.objects.bulk_update(after, sorted(fields))
+
+        removed = [existing[pk] for _, pk, _ in deletes]
+        Transaction.objects.filter(user=user, pk__in=[txn.pk for txn in removed]).delete()
+        for index, pk, _ in deletes:
+            results[index].update(status='deleted', id=pk)
+
+        ledger.transactions_changed(user, added=created + after, removed=before + removed)
+        merchants.learn(user, merchants.recategorized(before, after))
+
+    return True, results
@@ -0,0 +1,119 @@
+"""
+Month-to-date spend counters and budget alerts.
+
+Each write moves the user's MonthlySpend row with an F() delta, so alert
+cost doesn't depend on how many transactions the month already holds.
+Threshold crossings are claimed with a conditional UPDATE that compares
+the stored alert level with the new amount in the same statement, which
+makes each notification fire at most once per threshold per month even
+with concurrent writers.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import DailyRollup, MonthlyBudget, MonthlySpend, Notification
+from .rollups import local_day
+
+# Checked from the highest down so a single big expense only sends the
+# strongest alert
+ALERTS = [
+    (100, 'Budget Exceeded!', 'error'),
+    (80, 'Budget Alert', 'warning'),
+]
+
+
+def month_of(value):
+    return local_day(value).replace(day=1)
+
+
+def spend_deltas(added=(), removed=()):
+    """Expense delta per local month for rows added and removed."""
+    deltas = {}
+    for sign, transactions in ((1, added), (-1, removed)):
+        for txn in transactions:
+            if txn.transaction_type != 'expense':
+                continue
+            month = month_of(txn.date)
+            deltas[month] = deltas.get(month, Decimal('0')) + sign * Decimal(str(txn.amount))
+    return deltas
+
+
+def record_spend(user, deltas):
+    for month, delta in deltas.items():
+        if not delta:
+            continue
+        counters = MonthlySpend.objects.filter(user=user, month=month)
+        if counters.update(amount=F('amount') + delta):
+            continue
+        try:
+            with db_transaction.atomic():
+                MonthlySpend.objects.create(user=user, month=month, amount=delta)
+        except IntegrityError:
+            # Another writer created the row first
+            counters.update(amount=F('amount') + delta)
+
+
+def check_budget(user):
+    """Sends the 80%/100% alerts for the current month if a threshold was newly crossed."""
+    budget = MonthlyBudget.objects.filter(user=user).values_list('amount', flat=True).first()
+    if not budget or budget <= 0:
+        return None
+
+    counter = MonthlySpend.objects.filter(user=user, month=month_of(timezone.now()))
+    for threshold, title, notification_type in ALERTS:
+        limit = budget * threshold / 100
+        claimed = counter.filter(amount__gte=limit, alert_level__lt=threshold).update(alert_level=threshold)
+        if not claimed:
+            continue
+
+        if threshold >= 100:
+            message = f"You've exceeded your monthly budget of {budget}!"
+        else:
+            spent = counter.values_list('amount', flat=True).first()
+            message = f"Heads up! You've used {int(spent / budget * 100)}% of your monthly budget."
+        return Notification.objects.create(
+            user=user,
+            title=title,
+            message=message,
+            notification_type=notification_type
+        )
+    return None
+
+
+def clear(user):
+    MonthlySpend.objects.filter(user=user).delete()
+
+
+def rebuild(user=None):
+    """Recomputes the counters from the daily rollups, keeping alert levels already sent."""
+    rollups = DailyRollup.objects.filter(transaction_type='expense')
+    counters = MonthlySpend.objects.all()
+    if user is not None:
+        rollups = rollups.filter(user=user)
+        counters = counters.filter(user=user)
+
+    sent = {(row.user_id, row.month): row.alert_level for row in counters}
+    totals = (
+        rollups
+        .annotate(month=TruncMonth('day'))
+        .values('user_id', 'month')
+        .annotate(amount=Sum('total'))
+        .order_by()
+    )
+
+    with db_transaction.atomic():
+        counters.delete()
+        created = MonthlySpend.objects.bulk_create([
+            MonthlySpend(
+                user_id=row['user_id'],
+                month=row['month'],
+                amount=row['amount'],
+                alert_level=sent.get((row['user_id'], row['month']), 0),
+            )
+            for row in totals
+        ], batch_size=1000)
+    return len(created)
@@ -0,0 +1,141 @@
+"""
+Keyword -> category engine shared by the SMS, statement and quick-add
+parsers.
+
+All rules (the built-ins below plus active CategoryRule rows) are compiled
+into one alternation regex, longest keywords first, so a text is scanned
+once instead of once per keyword list. Keywords must start at a word
+boundary; short ones (and rules marked whole_word) must also end at one,
+so "ola" doesn't fire on "coca cola". When several rules match, the lowest
+priority value wins.
+
+The compiled engine is kept per process and rebuilt when the rules
+generation in the shared stats cache moves, which CategoryRule and
+Category writes bump through signals.
+"""
+import logging
+import re
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+Rule = namedtuple('Rule', 'keyword category priority whole_word transaction_type')
+
+# Keywords this short only match whole words
+SHORT_KEYWORD_LENGTH = 3
+
+DEFAULT_CATEGORY = 'General'
+
+# (category, keywords) in priority order. A None category masks a phrase:
+# it is consumed without classifying, so "auto debit" isn't read as "auto".
+BUILTIN_RULES = [
+    (None, ['auto debit', 'autopay', 'auto pay']),
+    ('Food', ['zomato', 'swiggy', 'eat', 'food', 'restaurant', 'cafe', 'mcdonald', 'kfc', 'domino', 'dinner', 'lunch', 'coffee', 'tea', 'snacks', 'drink']),
+    ('Shopping', ['amazon', 'flipkart', 'myntra', 'shop', 'mart', 'supermarket', 'mall', 'store', 'reliance', 'grocery', 'groceries']),
+    ('Travel', ['uber', 'ola', 'rapido', 'irctc', 'ticket', 'flight', 'petrol', 'fuel', 'hpcl', 'bpcl', 'ioc', 'cab', 'auto']),
+    ('Entertainment', ['netflix', 'spotify', 'prime', 'hotstar', 'movie', 'cinema', 'pvr']),
+    ('Health', ['hospital', 'pharmacy', 'clinic', 'medical', 'doctor', 'apollo', 'medplus']),
+    ('Income', ['salary', 'neft', 'imps', 'tfr', 'credited']),
+    ('Bills', ['bill', 'recharge', 'airtel', 'jio', 'vi', 'electricity', 'water', 'bescom']),
+]
+
+# Transfers only mean income when money came in
+INCOME_ONLY = {'Income'}
+
+
+def builtin_rules():
+    rules = []
+    for index, (category, keywords) in enumerate(BUILTIN_RULES):
+        transaction_type = 'income' if category in INCOME_ONLY else ''
+        rules.extend(Rule(keyword, category, (index + 1) * 10, False, transaction_type) for keyword in keywords)
+    return rules
+
+
+class Engine:
+    def __init__(self, rules):
+        self.rules = {}
+        for rule in sorted(rules, key=lambda rule: rule.priority):
+            # On a repeated keyword the higher-precedence rule wins
+            self.rules.setdefault(rule.keyword, rule)
+
+        alternatives = []
+        for keyword in sorted(self.rules, key=len, reverse=True):
+            pattern = re.escape(keyword)
+            if self.rules[keyword].whole_word or len(keyword) <= SHORT_KEYWORD_LENGTH:
+                pattern += r'(?![a-z0-9])'
+            alternatives.append(pattern)
+        self.pattern = re.compile(r'(?<![a-z0-9])(?:' + '|'.join(alternatives) + ')') if alternatives else None
+
+    def classify(self, text, transaction_type=None, default=DEFAULT_CATEGORY):
+        """
+        Category name for `text`, or `default`. Rules limited to one
+        transaction type only apply to rows known to be of that type, so a
+        transfer keyword can't turn a row of unknown type into income.
+        """
+        if not text or self.pattern is None:
+            return default
+        best = None
+        for match in self.pattern.finditer(text.lower()):
+            rule = self.rules[match.group(0)]
+            if rule.category is None:
+                continue
+            if rule.transaction_type and rule.transaction_type != transaction_type:
+                continue
+            if best is None or rule.priority < best.priority:
+                best = rule
+        return best.category if best else default
+
+
+_builtin_engine = Engine(builtin_rules())
+_engine = None
+_engine_generation = None
+_pinned = False
+
+
+def _database_rules():
+    from .models import CategoryRule
+
+    rows = CategoryRule.objects.filter(is_active=True).exclude(keyword='').values_list(
+        'keyword', 'category__name', 'priority', 'whole_word', 'transaction_type',
+    )
+    return [Rule(keyword.lower(), *rest) for keyword, *rest in rows]
+
+
+def get_engine():
+    """
+    The compiled engine with the database rules, rebuilt only when the
+    rules generation changed. Falls back to the built-ins if the rules
+    can't be loaded (e.g. before migrations ran); the fallback is kept for
+    the same generation too, so the failing query isn't retried per call.
+    """
+    global _engine, _engine_generation
+    if _pinned:
+        return _engine
+    # Imported here: statement pool processes import this module (through
+    # utils) without Django being set up when they are spawned, not forked
+    from . import stats_cache
+
+    generation = stats_cache.rules_generation()
+    if _engine is None or generation != _engine_generation:
+        try:
+            database_rules = _database_rules()
+        except Exception:
+            logger.warning("Category rules unavailable, using the built-in rules", exc_info=True)
+            database_rules = []
+        _engine = Engine(builtin_rules() + database_rules) if database_rules else _builtin_engine
+        _engine_generation = generation
+    return _engine
+
+
+def pin_engine(engine):
+    """
+    Uses `engine` from now on without checking for new rules. For pool
+    processes, which get the parent's engine and must not touch the
+    database connections they inherited.
+    """
+    global _engine, _pinned
+    _engine, _pinned = engine, True
+
+
+def classify(text, transaction_type=None, default=DEFAULT_CATEGORY):
+    return get_engine().classify(text, transaction_type, default)
@@ -0,0 +1,60 @@
+"""
+Streaming CSV / NDJSON export of a user's transactions.
+
+Rows are pulled through QuerySet.iterator(chunk_size=...) (a server-side
+cursor on PostgreSQL) and written out one at a time, so memory per worker
+stays flat whether the user has a hundred rows or a million.
+"""
+import csv
+import json
+
+from django.utils import timezone
+
+CHUNK_SIZE = 2000
+
+FIELDS = [
+    ('id', 'id'),
+    ('date', 'date'),
+    ('title', 'title'),
+    ('amount', 'amount'),
+    ('transaction_type', 'transaction_type'),
+    ('category', 'category__name'),
+    ('payment_method', 'payment_method__name'),
+    ('description', 'description'),
+]
+
+# Cells starting with these are evaluated as formulas by spreadsheet apps
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Echo:
+    """File-like object whose write() just hands the line back to csv.writer."""
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset):
+    columns = [column for _, column in FIELDS]
+    for row in queryset.values_list(*columns).iterator(chunk_size=CHUNK_SIZE):
+        record = dict(zip((name for name, _ in FIELDS), row))
+        record['date'] = timezone.localtime(record['date']).isoformat()
+        record['amount'] = str(record['amount'])
+        yield record
+
+
+def _safe_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(queryset):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in FIELDS])
+    for record in export_rows(queryset):
+        yield writer.writerow([_safe_cell(record[name]) for name, _ in FIELDS])
+
+
+def stream_ndjson(queryset):
+    for record in export_rows(queryset):
+        yield json.dumps(record) + '\n'
@@ -0,0 +1,123 @@
+import datetime
+from decimal import Decimal, InvalidOperation
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Transaction
+from .rollups import day_start, local_range
+
+# Every accepted ordering is served by the (user, ..., date) indexes; anything
+# else (amount, title) would sort the user's whole history, so it's refused
+ORDERINGS = {
+    '-date': ('-date', '-id'),
+    'date': ('date', 'id'),
+}
+
+
+def _list_param(params, name):
+    values = []
+    for raw in params.getlist(name):
+        values.extend(part.strip() for part in raw.split(',') if part.strip())
+    return values
+
+
+def _ids(params, name):
+    try:
+        return [int(value) for value in _list_param(params, name)]
+    except ValueError:
+        raise ValidationError({name: 'Expected a comma separated list of ids.'})
+
+
+def _day(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: 'Expected a YYYY-MM-DD date.'})
+
+
+def _bound(name, compute):
+    """
+    The aware datetime `compute()` returns for a date filter, or a 400 when
+    it falls off the calendar: the day after 9999-12-31, or local midnight
+    of 0001-01-01, which is still before year 1 in UTC.
+    """
+    try:
+        moment = compute()
+        moment.astimezone(datetime.timezone.utc)
+    except OverflowError:
+        raise ValidationError({name: 'Expected a YYYY-MM-DD date.'})
+    return moment
+
+
+def _amount(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: 'Expected a number.'})
+    # Decimal also parses nan and infinity, which the amount lookup rejects with a 500
+    if not amount.is_finite():
+        raise ValidationError({name: 'Expected a number.'})
+    return amount
+
+
+def get_ordering(params):
+    ordering = params.get('ordering', '-date')
+    if ordering not in ORDERINGS:
+        raise ValidationError({'ordering': f"Unsupported ordering. Use one of: {', '.join(ORDERINGS)}."})
+    return ORDERINGS[ordering]
+
+
+def filter_transactions(queryset, params):
+    """
+    Applies the list filters to a user-scoped Transaction queryset.
+
+    date_from / date_to   local days, inclusive (half-open range on `date`)
+    type                  expense | income
+    category              one or more category ids
+    payment_method        one or more payment method ids
+    amount_min / amount_max
+    ordering              -date (default) | date
+    """
+    date_from, date_to = _day(params, 'date_from'), _day(params, 'date_to')
+    if date_from and date_to and date_from > date_to:
+        raise ValidationError({'date_from': 'date_from must not be after date_to.'})
+    if date_from:
+        queryset = queryset.filter(date__gte=_bound('date_from', lambda: day_start(date_from)))
+    if date_to:
+        queryset = queryset.filter(date__lt=_bound('date_to', lambda: local_range(date_to, date_to)[1]))
+
+    transaction_type = params.get('type')
+    if transaction_type:
+        if transaction_type not in dict(Transaction.TRANSACTION_TYPES):
+            raise ValidationError({'type': 'Expected expense or income.'})
+        queryset = queryset.filter(transaction_type=transaction_type)
+
+    categories = _ids(params, 'category')
+    if categories:
+        queryset = queryset.filter(category__in=categories)
+
+    payment_methods = _ids(params, 'payment_method')
+    if payment_methods:
+        queryset = queryset.filter(payment_method__in=payment_methods)
+
+    amount_min, amount_max = _amount(params, 'amount_min'), _amount(params, 'amount_max')
+    if amount_min is not None:
+        queryset = queryset.filter(amount__gte=amount_min)
+    if amount_max is not None:
+        queryset = queryset.filter(amount__lte=amount_max)
+
+    return queryset.order_by(*get_ordering(params))
+
+
+class TransactionFilterBackend(BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        if getattr(view, 'action', None) != 'list':
+            return queryset
+        return filter_transactions(queryset, request.query_params)
@@ -0,0 +1,78 @@
+"""
+Content fingerprints for imported transactions.
+
+A fingerprint hashes the user, the normalized title, the amount, the local
+day and the source the row came from ('statement' or 'sms'). The column has
+a unique index, so importers can skip duplicates with one indexed lookup
+instead of comparing (title, amount, date) row by row. insert_new does
+the lookup and the insert for the statement and SMS importers, including
+the retry when a concurrent import wins the race. Manually entered
+transactions have no fingerprint, and edits keep the original one so
+re-importing the same statement doesn't bring an edited row back.
+"""
+import hashlib
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction as db_transaction
+
+from .models import Transaction
+from .rollups import local_day
+
+SOURCES = ('statement', 'sms')
+
+
+def normalize_title(title):
+    return ' '.join((title or '').split()).casefold()
+
+
+def fingerprint(user_id, title, amount, date, source):
+    if source not in SOURCES:
+        raise ValueError(f"Unknown transaction source: {source}")
+    key = '|'.join([
+        str(user_id),
+        normalize_title(title),
+        f'{Decimal(amount):.2f}',
+        local_day(date).isoformat(),
+        source,
+    ])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def existing_fingerprints(fingerprints):
+    """{fingerprint: transaction id} for the `fingerprints` already in the database (one query)."""
+    return dict(Transaction.objects.filter(fingerprint__in=set(fingerprints)).values_list('fingerprint', 'id'))
+
+
+def insert_new(entries, build, on_created=None, batch_size=None):
+    """
+    Inserts a transaction for each (fingerprint, item) in `entries` whose
+    fingerprint is neither in the database nor earlier in `entries` (the
+    first copy wins). build(item) returns the unsaved Transaction, and
+    on_created(created) runs in the insert's transaction, e.g. to report
+    the rows to the ledger.
+
+    A concurrent import can insert some of the rows between the lookup and
+    the insert. The unique index then rejects the whole insert, and the
+    lookup and insert run once more, so only rows really inserted here are
+    returned and reported. Returns ({fingerprint: id} found in the
+    database, [created transactions]).
+    """
+    entries = list(entries)
+    for attempt in range(2):
+        existing = existing_fingerprints(fingerprint for fingerprint, _ in entries)
+        seen = set(existing)
+        pending = []
+        for fingerprint, item in entries:
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            pending.append(build(item))
+        try:
+            with db_transaction.atomic():
+                created = Transaction.objects.bulk_create(pending, batch_size=batch_size)
+                if on_created:
+                    on_created(created)
+            return existing, created
+        except IntegrityError:
+            if attempt:
+                raise
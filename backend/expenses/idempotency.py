@@ -0,0 +1,97 @@
+"""
+Idempotency keys for retried writes.
+
+A client sends an Idempotency-Key header (sms_webhook falls back to a hash
+of sender and body). The first request with a key runs normally; its
+response is stored in IdempotencyKey within the same database
+transaction. A replay within IDEMPOTENCY_KEY_TTL gets the stored response
+back, marked with an Idempotent-Replayed header, without running again.
+Two copies arriving together both run, but only one can insert the key
+(unique index). The other rolls its work back and replays the winner's
+response. A key reused for a different request is rejected with 422.
+"""
+import datetime
+import hashlib
+import json
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction as db_transaction
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+KEY_MAX_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+Outcome = namedtuple('Outcome', 'status body replayed')
+
+KEY_REUSED = Outcome(422, {'error': 'This Idempotency-Key was already used for a different request'}, False)
+
+
+def key_from(request):
+    """The request's Idempotency-Key header, or None."""
+    key = request.META.get(HEADER, '').strip()
+    return key[:KEY_MAX_LENGTH] or None
+
+
+def request_hash(data):
+    """SHA-256 of a request body (raw text, or parsed data as canonical JSON)."""
+    if not isinstance(data, str):
+        data = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def _replay(stored, digest):
+    if stored.request_hash != digest:
+        return KEY_REUSED
+    return Outcome(stored.response_status, stored.response_body, True)
+
+
+def execute(scope, key, digest, handler):
+    """
+    Runs `handler() -> (status, body)` at most once per (scope, key) within
+    the TTL and returns an Outcome. Responses with status 500 and up are
+    not stored, so a retry runs again.
+    """
+    now = timezone.now()
+    stored = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+    if stored is not None and stored.expires_at > now:
+        return _replay(stored, digest)
+
+    try:
+        with db_transaction.atomic():
+            status, body = handler()
+            if status >= 500:
+                return Outcome(status, body, False)
+            if stored is not None:
+                # Expired and not pruned yet
+                IdempotencyKey.objects.filter(pk=stored.pk).delete()
+            IdempotencyKey.objects.create(
+                scope=scope,
+                key=key,
+                request_hash=digest,
+                response_status=status,
+                response_body=body,
+                expires_at=now + datetime.timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+            )
+    except IntegrityError:
+        # A concurrent copy of this request stored its response first
+        stored = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+        if stored is None:
+            raise
+        return _replay(stored, digest)
+    return Outcome(status, body, False)
+
+
+def prune_expired(batch_size=1000, now=None):
+    """Deletes expired keys in batches of `batch_size` rows. Returns how many."""
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        batch = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list('id', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=batch).delete()[0]
@@ -0,0 +1,141 @@
+"""
+Set-based import of parsed statement rows.
+
+Instead of an exists() check, a get_or_create and a single-row insert per
+row, an import resolves every category name once, looks up the rows'
+fingerprints (see expenses.fingerprints) in one query against the unique
+index, applies the user's learned merchant categories (see
+expenses.merchants, also one query) and inserts the new rows with one
+bulk_create inside transaction.atomic() (fingerprints.insert_new).
+Long statements are streamed through import_statement_stream, which does
+the same per chunk of rows.
+"""
+import itertools
+import re
+
+from django.utils.html import strip_tags
+
+from . import ledger, merchants, stats_cache
+from .fingerprints import existing_fingerprints, fingerprint, insert_new
+from .models import Category, PaymentMethod, Transaction
+from .rollups import day_start, local_day
+
+BULK_BATCH_SIZE = 500
+
+TITLE_MAX_LENGTH = Transaction._meta.get_field('title').max_length
+
+
+def clean_title(title):
+    # Prevent XSS/Injection on title using strict ASCII matching: remove
+    # all non-printable ASCII characters or hidden control codes
+    title = re.sub(r'[^\x20-\x7E]', '', strip_tags(title)).strip()
+    return title[:TITLE_MAX_LENGTH].strip()
+
+
+def resolve_by_name(model, names, build):
+    """
+    Maps names to `model` rows, creating the missing ones (build(name)
+    returns the unsaved row) in one insert. Returns the mapping and whether
+    anything was created.
+    """
+    names = set(names)
+    rows = {}
+    # Names aren't unique; like get_or_create's first match, keep the oldest row
+    for row in model.objects.filter(name__in=names).order_by('-id'):
+        rows[row.name] = row
+
+    missing = names - set(rows)
+    if missing:
+        model.objects.bulk_create([build(name) for name in sorted(missing)])
+        for row in model.objects.filter(name__in=missing).order_by('-id'):
+            rows[row.name] = row
+    return rows, bool(missing)
+
+
+def resolve_categories(names):
+    """Maps category names to Category rows, creating the missing ones in one insert."""
+    categories, created = resolve_by_name(Category, names, lambda name: Category(name=name, icon='List', budget_limit=0))
+    if created:
+        # bulk_create skips the post_save signal that normally does this
+        stats_cache.bump_reference_generation()
+    return categories
+
+
+def statement_fingerprint(user, row):
+    return fingerprint(user.pk, clean_title(row['title']), row['amount'], row['date'], 'statement')
+
+
+def mark_duplicates(user, rows):
+    """Flags rows an import would skip because they already exist (one query)."""
+    rows = list(rows)
+    fingerprints = [statement_fingerprint(user, row) for row in rows]
+    existing = set(existing_fingerprints(fingerprints))
+    for row, row_fingerprint in zip(rows, fingerprints):
+        row['duplicate'] = row_fingerprint in existing
+        existing.add(row_fingerprint)
+    return rows
+
+
+def import_statement_rows(user, rows, payment_method=None):
+    """
+    Inserts parsed statement rows for `user`, skipping rows that already
+    exist (same fingerprint: title, amount and day) in the database or
+    earlier in the same statement. Returns (created_count, skipped_count).
+    """
+    rows = [dict(row, title=clean_title(row['title']), date=day_start(local_day(row['date']))) for row in rows]
+    if not rows:
+        return 0, 0
+
+    if payment_method is None:
+        payment_method, _ = PaymentMethod.objects.get_or_create(name='Bank Transfer', defaults={'icon': 'Landmark'})
+    # Merchants the user re-categorized before keep the category they chose
+    learned = merchants.MerchantLookup(user, (row['title'] for row in rows))
+    for row in rows:
+        row['category_id'] = learned.category_id(row['title'])
+    categories = resolve_categories(row.get('category_name', 'General') for row in rows if row['category_id'] is None)
+
+    for row in rows:
+        row['fingerprint'] = statement_fingerprint(user, row)
+
+    def build(row):
+        return Transaction(
+            user=user,
+            title=row['title'],
+            amount=row['amount'],
+            date=row['date'],
+            transaction_type=row['transaction_type'],
+            category_id=row['category_id'] or categories[row.get('category_name', 'General')].pk,
+            payment_method=payment_method,
+            fingerprint=row['fingerprint'],
+        )
+
+    _, created = insert_new(
+        ((row['fingerprint'], row) for row in rows),
+        build,
+        on_created=lambda created: ledger.transactions_changed(user, added=created),
+        batch_size=BULK_BATCH_SIZE,
+    )
+    return len(created), len(rows) - len(created)
+
+
+def import_statement_stream(user, rows, chunk_size=BULK_BATCH_SIZE):
+    """
+    Imports an iterable of parsed rows chunk by chunk, so only one chunk is
+    held in memory. Each chunk commits on its own; rows committed by earlier
+    chunks count as existing for later ones, so duplicates are still skipped
+    across the whole statement and a failed import can simply be re-run.
+    Returns (created_count, skipped_count).
+    """
+    rows = iter(rows)
+    payment_method = None
+    created_total = skipped_total = 0
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        if payment_method is None:
+            payment_method, _ = PaymentMethod.objects.get_or_create(name='Bank Transfer', defaults={'icon': 'Landmark'})
+        created, skipped = import_statement_rows(user, chunk, payment_method=payment_method)
+        created_total += created
+        skipped_total += skipped
+    return created_total, skipped_total
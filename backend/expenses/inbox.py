@@ -0,0 +1,178 @@
+"""
+Accept-fast inbox for the SMS webhook.
+
+sms_webhook only appends the raw request body to SmsInbox and answers 202,
+so a slow database can't make the forwarding app time out and retry. The
+process_sms_inbox management command claims pending entries in batches and
+logs them through expenses.sms.ingest, one parse/insert pass per batch.
+Entries that fail are retried with backoff. Malformed payloads, and entries
+that fail MAX_ATTEMPTS times, are dead-lettered with their last error.
+"""
+import datetime
+import json
+import logging
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import sms
+from .models import SmsInbox
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+
+MAX_ATTEMPTS = 5
+
+# Delay before the first retry, doubled after every further failure
+RETRY_DELAY = datetime.timedelta(seconds=30)
+
+# An entry still 'processing' after this long belongs to a worker that died
+STALE_AFTER = datetime.timedelta(minutes=5)
+
+# Processed entries are kept this long; dead letters stay until handled
+RETENTION = datetime.timedelta(days=7)
+
+
+class Rejected(Exception):
+    """The payload can never be logged, so retrying is pointless."""
+
+
+def append(payload):
+    entry = SmsInbox.objects.create(payload=payload)
+    if getattr(settings, 'SMS_INBOX_EAGER', False):
+        # No worker in this setup (tests, plain runserver): process right away
+        process_batch(claim_batch(pks=[entry.pk]))
+        entry.refresh_from_db()
+    return entry
+
+
+def claim_batch(limit=BATCH_SIZE, pks=None):
+    """
+    Marks up to `limit` due pending entries (or the entries `pks`) as
+    processing and returns them, oldest first. As in jobs.claim, SKIP LOCKED
+    keeps concurrent workers apart and the status condition on the UPDATE
+    does the same on SQLite.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    with db_transaction.atomic():
+        due = SmsInbox.objects.filter(status='pending', next_attempt_at__lte=now).order_by('id')
+        if pks is not None:
+            due = due.filter(pk__in=pks)
+        ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        SmsInbox.objects.filter(pk__in=ids, status='pending').update(
+            status='processing', claim=token, claimed_at=now, attempts=F('attempts') + 1,
+        )
+    return list(SmsInbox.objects.filter(claim=token, status='processing').order_by('id'))
+
+
+def requeue_stale(now=None):
+    """
+    Puts entries abandoned by a crashed worker back in the queue, or
+    dead-letters them once they have used up MAX_ATTEMPTS (a message that
+    kills the worker every time). Returns the number of entries touched.
+    """
+    now = now or timezone.now()
+    stale = SmsInbox.objects.filter(status='processing', claimed_at__lt=now - STALE_AFTER)
+    dead = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status='dead', claim='', processed_at=now, last_error='Worker stopped while processing this message',
+    )
+    return dead + stale.update(status='pending', claim='')
+
+
+def purge_processed(now=None):
+    """Deletes processed entries older than RETENTION. Returns how many."""
+    cutoff = (now or timezone.now()) - RETENTION
+    deleted, _ = SmsInbox.objects.filter(status='done', processed_at__lt=cutoff).delete()
+    return deleted
+
+
+def _message(entry):
+    try:
+        message = json.loads(entry.payload)
+    except ValueError as e:
+        raise Rejected(f"Invalid JSON: {e}")
+    if not isinstance(message, dict):
+        raise Rejected('Expected a JSON object')
+    return message
+
+
+def _settle(entries, now):
+    for entry in entries:
+        entry.claim = ''
+        if entry.status != 'pending':
+            entry.processed_at = now
+    SmsInbox.objects.bulk_update(entries, ['status', 'result', 'last_error', 'claim', 'processed_at', 'next_attempt_at'])
+
+
+def _failed(entry, error, now):
+    entry.last_error = str(error)
+    if isinstance(error, Rejected) or entry.attempts >= MAX_ATTEMPTS:
+        entry.status = 'dead'
+        entry.result = {'status': 'error', 'message': str(error)}
+    else:
+        entry.status = 'pending'
+        entry.next_attempt_at = now + RETRY_DELAY * 2 ** (entry.attempts - 1)
+
+
+def _ingest(user, entries, messages, now):
+    results = sms.ingest(user, messages)
+    for entry, result in zip(entries, results):
+        if result['status'] == 'error':
+            _failed(entry, Rejected(result['message']), now)
+        else:
+            entry.status, entry.result, entry.last_error = 'done', result, ''
+
+
+def process_batch(entries):
+    """Logs claimed entries, recording each one's outcome. Returns how many were processed."""
+    if not entries:
+        return 0
+    now = timezone.now()
+    valid, messages = [], []
+    for entry in entries:
+        try:
+            messages.append(_message(entry))
+            valid.append(entry)
+        except Rejected as e:
+            _failed(entry, e, now)
+
+    if valid:
+        # For now every SMS is logged for the first user, like the webhook always did (DEMO ONLY)
+        user = User.objects.first()
+        if user is None:
+            for entry in valid:
+                _failed(entry, RuntimeError('No user available for SMS logging'), now)
+        else:
+            try:
+                _ingest(user, valid, messages, now)
+            except Exception:
+                # Retry one by one so a single bad message doesn't hold back the rest
+                for entry, message in zip(valid, messages):
+                    try:
+                        _ingest(user, [entry], [message], now)
+                    except Exception as e:
+                        logger.exception("SMS inbox entry %s failed (attempt %s)", entry.pk, entry.attempts)
+                        _failed(entry, e, now)
+
+    _settle(entries, now)
+    return len(entries)
+
+
+def process_pending(limit=None):
+    """Drains due entries batch by batch (at most `limit` batches). Returns the entry count."""
+    processed = batches = 0
+    while limit is None or batches < limit:
+        entries = claim_batch()
+        if not entries:
+            break
+        processed += process_batch(entries)
+        batches += 1
+    return processed
@@ -0,0 +1,221 @@
+"""
+Database-backed queue for bank statement imports.
+
+upload_statement only validates the PDF, spools it to IMPORT_SPOOL_DIR and
+queues an ImportJob; the process_import_jobs management command claims jobs
+one at a time and does the slow pdfplumber work outside the request, so a
+large statement no longer pins a gunicorn worker. The worker streams rows
+page by page into the staging table (see expenses.staging) and, unless
+the job is a preview, from there into chunked inserts. Clients poll
+/api/import-jobs/<id>/.
+"""
+import datetime
+import hashlib
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import staging
+from .importers import import_statement_stream
+from .models import ImportJob
+from .utils import iter_federal_bank_statement
+
+logger = logging.getLogger(__name__)
+
+# A job still 'running' after this long belongs to a worker that died
+STALE_AFTER = datetime.timedelta(minutes=10)
+
+MAX_ATTEMPTS = 3
+
+# A job still 'queued' after this long is failed and its spooled file (and
+# password) deleted, e.g. when no worker is running
+QUEUED_EXPIRY = datetime.timedelta(days=1)
+
+PASSWORD_SUFFIX = '.key'
+
+FAILED_MESSAGE = "Failed to safely parse document. Ensure the file is uncorrupted and format matches."
+
+EXPIRED_MESSAGE = "The statement wasn't processed in time. Please upload it again."
+
+
+def spool(uploaded_file, password=''):
+    """
+    Copies an upload to the spool directory chunk by chunk. Returns the path
+    and the SHA-256 of the bytes, which keys the staging cache. The PDF
+    password, if any, goes to an owner-only file next to it rather than into
+    the database, and is deleted with it.
+    """
+    spool_dir = settings.IMPORT_SPOOL_DIR
+    os.makedirs(spool_dir, exist_ok=True)
+    uploaded_file.seek(0)
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(suffix='.pdf', dir=spool_dir)
+    with os.fdopen(fd, 'wb') as out:
+        for chunk in uploaded_file.chunks():
+            digest.update(chunk)
+            out.write(chunk)
+    if password:
+        key_fd = os.open(path + PASSWORD_SUFFIX, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(key_fd, 'w', encoding='utf-8') as out:
+            out.write(password)
+    return path, digest.hexdigest()
+
+
+def spooled_password(path):
+    try:
+        with open(path + PASSWORD_SUFFIX, encoding='utf-8') as key_file:
+            return key_file.read()
+    except FileNotFoundError:
+        return ''
+
+
+def discard(path):
+    if path:
+        for spooled in (path, path + PASSWORD_SUFFIX):
+            try:
+                os.remove(spooled)
+            except FileNotFoundError:
+                pass
+
+
+def enqueue(user, file_name, file_path, file_hash, preview=False):
+    # Uploads nobody processed are cleared here too, for setups without a worker
+    expire_queued()
+    job = ImportJob.objects.create(
+        user=user,
+        file_name=file_name[:255],
+        file_path=file_path,
+        file_hash=file_hash,
+        preview=preview,
+    )
+    if getattr(settings, 'IMPORT_JOBS_EAGER', False):
+        # No worker in this setup (tests, plain runserver): process right away
+        if claim(job.pk):
+            run(job.pk)
+        job.refresh_from_db()
+    return job
+
+
+def claim(pk=None):
+    """
+    Marks the oldest queued job (or job `pk`) as running and returns its id,
+    or None when there is nothing to do. SKIP LOCKED lets several workers
+    poll the table without handing out one job twice; the status condition
+    on the UPDATE does the same on backends without row locks (SQLite).
+    """
+    with db_transaction.atomic():
+        queued = ImportJob.objects.filter(status='queued').order_by('created_at', 'id')
+        if pk is not None:
+            queued = queued.filter(pk=pk)
+        job_id = queued.select_for_update(skip_locked=True).values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+        claimed = ImportJob.objects.filter(pk=job_id, status='queued').update(
+            status='running', started_at=timezone.now(), progress=0, attempts=F('attempts') + 1,
+        )
+    return job_id if claimed else None
+
+
+def requeue_stale(now=None):
+    """
+    Puts jobs abandoned by a crashed worker back in the queue, or fails them
+    once they have used up MAX_ATTEMPTS. Returns the number of jobs touched.
+    """
+    cutoff = (now or timezone.now()) - STALE_AFTER
+    stale = ImportJob.objects.filter(status='running', started_at__lt=cutoff)
+    exhausted = list(stale.filter(attempts__gte=MAX_ATTEMPTS).values_list('id', 'file_path'))
+    for job_id, file_path in exhausted:
+        _finish(job_id, file_path, status='failed', message=FAILED_MESSAGE)
+    return len(exhausted) + stale.update(status='queued', started_at=None)
+
+
+def expire_queued(now=None):
+    """Fails jobs that waited longer than QUEUED_EXPIRY for a worker. Returns how many."""
+    cutoff = (now or timezone.now()) - QUEUED_EXPIRY
+    expired = 0
+    for job_id, file_path in ImportJob.objects.filter(status='queued', created_at__lt=cutoff).values_list('id', 'file_path'):
+        # Conditional, so a job a worker claims meanwhile keeps its file
+        if ImportJob.objects.filter(pk=job_id, status='queued').update(status='failed', file_path='', finished_at=timezone.now(), message=EXPIRED_MESSAGE):
+            discard(file_path)
+            expired += 1
+    return expired
+
+
+def _report_progress(job_id):
+    last = [0]
+
+    def progress(done, total):
+        percent = int(done * 100 / total) if total else 100
+        # Only write when the visible number moves
+        if percent != last[0]:
+            last[0] = percent
+            ImportJob.objects.filter(pk=job_id).update(progress=percent)
+    return progress
+
+
+def _finish(job_id, file_path, **fields):
+    # The statement and its password aren't kept once the job has settled
+    ImportJob.objects.filter(pk=job_id).update(file_path='', finished_at=timezone.now(), **fields)
+    discard(file_path)
+
+
+def preview_message(staged):
+    return f"Parsed {staged.row_count} transactions. Review them and commit to import."
+
+
+def import_message(created_count, skipped_count):
+    return f"Successfully imported {created_count} transactions (Skipped {skipped_count} duplicates)."
+
+
+def commit(user, staged):
+    """Imports a staged statement's rows. Returns (created_count, skipped_count)."""
+    created_count, skipped_count = import_statement_stream(user, staging.staged_rows(staged))
+    staging.mark_committed(staged)
+    return created_count, skipped_count
+
+
+def run(job_id):
+    """Parses (or reuses the staged copy of) one claimed job, recording the outcome on the row."""
+    job = ImportJob.objects.select_related('user').get(pk=job_id)
+    try:
+        staged = staging.find(job.user, job.file_hash)
+        if staged is None:
+            rows = iter_federal_bank_statement(job.file_path, password=spooled_password(job.file_path), progress=_report_progress(job.pk))
+            staged = staging.stage(job.user, job.file_hash, rows)
+        if job.preview:
+            _finish(job.pk, job.file_path, status='done', progress=100, staged=staged, message=preview_message(staged))
+            return True
+        created_count, skipped_count = commit(job.user, staged)
+    except Exception:
+        # The client only sees the generic message
+        logger.exception("Import job %s failed", job.pk)
+        _finish(job.pk, job.file_path, status='failed', message=FAILED_MESSAGE)
+        return False
+
+    _finish(
+        job.pk, job.file_path,
+        status='done',
+        progress=100,
+        staged=staged,
+        created_count=created_count,
+        skipped_count=skipped_count,
+        message=import_message(created_count, skipped_count),
+    )
+    return True
+
+
+def process_pending(limit=None):
+    """Runs queued jobs until the queue is empty (or `limit` jobs ran). Returns the count."""
+    processed = 0
+    while limit is None or processed < limit:
+        job_id = claim()
+        if job_id is None:
+            break
+        run(job_id)
+        processed += 1
+    return processed
@@ -0,0 +1,31 @@
+"""
+Single entry point for keeping data derived from transactions in step with
+writes. Every path that creates, edits or deletes Transaction rows reports
+the rows it added and removed here instead of updating derived tables
+itself. An update is reported as the old row removed and the new one added.
+"""
+from django.utils import timezone
+
+from . import budget, rollups, stats_cache
+
+
+def transactions_changed(user, added=(), removed=()):
+    added, removed = list(added), list(removed)
+    if not added and not removed:
+        return
+
+    rollups.refresh_days(user, [txn.date for txn in added + removed])
+
+    deltas = budget.spend_deltas(added, removed)
+    budget.record_spend(user, deltas)
+    # One budget evaluation per call, however many rows a batch carried
+    if deltas.get(budget.month_of(timezone.now()), 0) > 0:
+        budget.check_budget(user)
+
+    stats_cache.bump_generation(user)
+
+
+def transactions_reset(user):
+    rollups.clear(user)
+    budget.clear(user)
+    stats_cache.bump_generation(user)
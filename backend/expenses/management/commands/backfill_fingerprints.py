@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction as db_transaction
+from expenses.fingerprints import fingerprint
+from expenses.models import Transaction
+
+SMS_PREFIX = 'Auto-logged from SMS'
+
+# What the statement importer has always written: this method, no description
+STATEMENT_METHOD = 'Bank Transfer'
+
+class Command(BaseCommand):
+    help = (
+        'Fills Transaction.fingerprint for rows created before fingerprints existed. '
+        'Only SMS rows and statement-shaped rows (Bank Transfer, no description) get one; '
+        'other rows are treated as manual entries and left empty, so they never block a '
+        'statement line. A manual Bank Transfer entry without a description is '
+        'indistinguishable from an imported one and is fingerprinted as a statement row. '
+        'Works in id order, one batch per transaction; re-run with --after-id to resume.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--after-id', type=int, default=0, help='Resume after this transaction id')
+
+    def handle(self, *args, **options):
+        last_id = options['after_id']
+        filled = skipped = 0
+        while True:
+            batch = list(
+                Transaction.objects
+                .filter(id__gt=last_id, fingerprint__isnull=True)
+                .order_by('id')
+                .select_related('payment_method')
+                .only('id', 'user_id', 'title', 'amount', 'date', 'description', 'payment_method__name')[:options['batch_size']]
+            )
+            if not batch:
+                break
+
+            updates = self.fingerprint_batch(batch)
+            try:
+                with db_transaction.atomic():
+                    Transaction.objects.bulk_update(updates, ['fingerprint'])
+            except IntegrityError:
+                # A row with one of these fingerprints was imported meanwhile
+                updates = [txn for txn in updates if self.save_one(txn)]
+
+            filled += len(updates)
+            skipped += len(batch) - len(updates)
+            last_id = batch[-1].id
+            self.stdout.write(f"Backfilled up to id {last_id} ({filled} filled, {skipped} left empty)")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {filled} fingerprints written, {skipped} manual entries and duplicates left empty"))
+
+    def source(self, txn):
+        # Rows don't record where they came from, so go by what each writer leaves behind
+        if (txn.description or '').startswith(SMS_PREFIX):
+            return 'sms'
+        if not txn.description and txn.payment_method and txn.payment_method.name == STATEMENT_METHOD:
+            return 'statement'
+        return None
+
+    def fingerprint_batch(self, batch):
+        batch = [txn for txn in batch if self.source(txn)]
+        for txn in batch:
+            txn.fingerprint = fingerprint(txn.user_id, txn.title, txn.amount, txn.date, self.source(txn))
+
+        taken = set(
+            Transaction.objects
+            .filter(fingerprint__in={txn.fingerprint for txn in batch})
+            .values_list('fingerprint', flat=True)
+        )
+        updates = []
+        for txn in batch:
+            # Of several identical rows only the first gets the fingerprint
+            if txn.fingerprint in taken:
+                continue
+            taken.add(txn.fingerprint)
+            updates.append(txn)
+        return updates
+
+    def save_one(self, txn):
+        try:
+            with db_transaction.atomic():
+                Transaction.objects.filter(pk=txn.pk).update(fingerprint=txn.fingerprint)
+            return True
+        except IntegrityError:
+            return False
@@ -0,0 +1,59 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from expenses.categorizer import get_engine
+from expenses.statement_samples import NARRATIONS
+
+# The keyword chain parse_federal_bank_statement used before the shared
+# engine, kept here as the baseline
+LEGACY_CHAIN = [
+    ('Food', ['zomato', 'swiggy', 'eat', 'food', 'restaurant', 'cafe', 'mcdonald', 'kfc', 'domino']),
+    ('Shopping', ['amazon', 'flipkart', 'myntra', 'shop', 'mart', 'supermarket', 'mall', 'store', 'reliance']),
+    ('Travel', ['uber', 'ola', 'rapido', 'irctc', 'ticket', 'flight', 'petrol', 'fuel', 'hpcl', 'bpcl', 'ioc']),
+    ('Entertainment', ['netflix', 'spotify', 'prime', 'hotstar', 'movie', 'cinema', 'pvr']),
+    ('Health', ['hospital', 'pharmacy', 'clinic', 'medical', 'doctor', 'apollo', 'medplus']),
+    ('Income', ['salary', 'neft', 'imps', 'tfr', 'credited']),
+    ('Bills', ['bill', 'recharge', 'airtel', 'jio', 'vi', 'electricity', 'water', 'bescom']),
+]
+
+NOISE = ['PAYMENT', 'REF 40211873', 'UPI', 'P2M', 'TXN 9912', 'SRI LAKSHMI TRADERS', 'XYZ PVT LTD']
+
+def legacy_classify(text):
+    text = text.lower()
+    for category, keywords in LEGACY_CHAIN:
+        if any(keyword in text for keyword in keywords):
+            return category
+    return 'General'
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark of statement narration categorization (rows/sec), legacy keyword chain vs compiled engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per classifier (best one is reported)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        texts = [
+            '/'.join([rng.choice(NARRATIONS + NOISE), rng.choice(NOISE), str(i)])
+            for i in range(options['rows'])
+        ]
+        engine = get_engine()
+        classifiers = [
+            ('legacy chain', legacy_classify),
+            ('engine', lambda text: engine.classify(text, 'expense')),
+        ]
+
+        baseline = None
+        for name, classify in classifiers:
+            best = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                for text in texts:
+                    classify(text)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            rate = len(texts) / best
+            baseline = baseline or rate
+            self.stdout.write(f"{name:<13} {rate:12,.0f} rows/sec  x{rate / baseline:.2f}")
@@ -0,0 +1,51 @@
+import io
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from expenses.statement_samples import sample_rows, statement_pdf
+from expenses.utils import parse_federal_bank_statement
+
+EXTRACTORS = {'table': False, 'fast': True}
+
+class Command(BaseCommand):
+    help = 'Parses a generated Federal Bank statement with each extractor and worker count and reports pages/sec'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=40, help='Pages in the generated statement')
+        parser.add_argument('--rows-per-page', type=int, default=40)
+        parser.add_argument('--workers', default='1,2,4', help='Comma separated worker counts to compare')
+        parser.add_argument('--extractors', default='table,fast', help='Comma separated extractors to compare: table (extract_table) and/or fast (text layer)')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per combination (best and worst are reported)')
+
+    def handle(self, *args, **options):
+        try:
+            worker_counts = [int(value) for value in options['workers'].split(',')]
+        except ValueError:
+            raise CommandError('--workers expects a comma separated list of integers')
+        extractors = options['extractors'].split(',')
+        if not set(extractors) <= set(EXTRACTORS):
+            raise CommandError(f"--extractors accepts: {', '.join(EXTRACTORS)}")
+
+        rows_per_page = options['rows_per_page']
+        data = statement_pdf(sample_rows(options['pages'] * rows_per_page), rows_per_page=rows_per_page)
+        pages = min(options['pages'], settings.STATEMENT_MAX_PAGES)
+        self.stdout.write(f"Statement: {pages} pages, {len(data) / 1024:.0f} KiB")
+
+        baseline = None
+        for extractor in extractors:
+            for workers in worker_counts:
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    rows = parse_federal_bank_statement(io.BytesIO(data), None, workers=workers, fast=EXTRACTORS[extractor])
+                    timings.append(time.perf_counter() - started)
+                best, worst = min(timings), max(timings)
+                baseline = baseline or best
+                self.stdout.write(
+                    f"{extractor:<6} workers={workers:<3} {best:7.3f}s (worst {worst:.3f}s)  {pages / best:7.1f} pages/sec  "
+                    f"x{baseline / best:.2f}  ({len(rows)} rows)"
+                )
+        # Ratios move by tens of percent between runs on a busy host; compare
+        # several runs, and real statements, before relying on one
+        self.stdout.write("Speedups are best-run ratios from this run only and vary between runs.")
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from expenses import jobs, staging
+
+# Expired staged statements and queued jobs are cleared at most this often (seconds)
+PURGE_INTERVAL = 60
+
+class Command(BaseCommand):
+    help = 'Parses and imports queued bank statement uploads (runs until stopped unless --once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        last_purge = None
+        while True:
+            if last_purge is None or time.monotonic() - last_purge >= PURGE_INTERVAL:
+                purged = staging.purge_expired()
+                if purged:
+                    self.stdout.write(f"Purged {purged} expired staged statements")
+                expired = jobs.expire_queued()
+                if expired:
+                    self.stdout.write(f"Expired {expired} import jobs left in the queue")
+                last_purge = time.monotonic()
+
+            requeued = jobs.requeue_stale()
+            if requeued:
+                self.stdout.write(f"Recovered {requeued} stale import jobs")
+
+            processed = jobs.process_pending()
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f"Processed {processed} import jobs"))
+
+            if options['once']:
+                break
+            if not processed:
+                time.sleep(options['sleep'])
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from expenses import idempotency, inbox
+
+# Old processed entries and expired idempotency keys are purged at most
+# this often (seconds)
+PURGE_INTERVAL = 60 * 60
+
+class Command(BaseCommand):
+    help = 'Logs SMS messages queued by the webhook (runs until stopped unless --once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the inbox once and exit')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the inbox is empty')
+
+    def handle(self, *args, **options):
+        last_purge = None
+        while True:
+            if last_purge is None or time.monotonic() - last_purge >= PURGE_INTERVAL:
+                purged = inbox.purge_processed()
+                if purged:
+                    self.stdout.write(f"Purged {purged} processed SMS inbox entries")
+                pruned = idempotency.prune_expired()
+                if pruned:
+                    self.stdout.write(f"Pruned {pruned} expired idempotency keys")
+                last_purge = time.monotonic()
+
+            requeued = inbox.requeue_stale()
+            if requeued:
+                self.stdout.write(f"Recovered {requeued} stale SMS inbox entries")
+
+            processed = inbox.process_pending()
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f"Processed {processed} SMS messages"))
+
+            if options['once']:
+                break
+            if not processed:
+                time.sleep(options['sleep'])
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from expenses import idempotency
+
+class Command(BaseCommand):
+    help = 'Deletes expired idempotency keys in batches, so no single DELETE holds locks for long.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = idempotency.prune_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} expired idempotency keys"))
@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from expenses import budget, rollups
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily rollup table and month-to-date spend counters from raw transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild rollups for this username')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user named {options['user']}")
+
+        written = rollups.rebuild(user)
+        counters = budget.rebuild(user)
+        scope = user.username if user else 'all users'
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} rollup rows and {counters} monthly counters for {scope}"))
@@ -0,0 +1,133 @@
+"""
+Per-user merchant -> category memory.
+
+When a user re-categorizes a transaction, its normalized title is stored in
+MerchantCategory. Importers then check the learned category before the
+keyword rules. Lookups go through a bounded in-process LRU. Before a batch
+(a statement chunk, an SMS) the missing keys are loaded in one query
+(`preload`), misses included, so each row afterwards is a dict hit.
+
+LRU keys carry the user's merchant generation from the shared stats cache,
+which every `learn` bumps, and the category rules generation. Entries made stale by an edit in another process
+are never read again and drop out of the LRU over time.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import stats_cache
+from .models import MerchantCategory
+
+MERCHANT_MAX_LENGTH = MerchantCategory._meta.get_field('merchant').max_length
+
+# Reference numbers and amounts differ on every row from the same merchant
+_DIGITS = re.compile(r'\d+')
+_SEPARATORS = re.compile(r'[^a-z]+')
+
+
+def normalize_merchant(title):
+    text = _DIGITS.sub(' ', (title or '').casefold())
+    return _SEPARATORS.sub(' ', text).strip()[:MERCHANT_MAX_LENGTH]
+
+
+class LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_cache = LRUCache(settings.MERCHANT_CACHE_SIZE)
+
+
+class MerchantLookup:
+    """Learned categories of one user for one batch, after a single preload."""
+
+    def __init__(self, user, titles=()):
+        self.user = user
+        # Category writes move the rules generation, so a deleted category's
+        # id isn't served from the LRU after its MerchantCategory rows cascade
+        self.generation = (stats_cache.merchant_generation(user), stats_cache.rules_generation())
+        self.preload(titles)
+
+    def _key(self, merchant):
+        return (self.user.pk, self.generation, merchant)
+
+    def preload(self, titles):
+        missing = {merchant for merchant in map(normalize_merchant, titles) if merchant}
+        missing = {merchant for merchant in missing if self._key(merchant) not in _cache}
+        if not missing:
+            return
+        found = dict(
+            MerchantCategory.objects
+            .filter(user=self.user, merchant__in=missing)
+            .values_list('merchant', 'category_id')
+        )
+        for merchant in missing:
+            # Misses are cached too, so rows without a learned merchant
+            # don't query either
+            _cache.set(self._key(merchant), found.get(merchant))
+
+    def category_id(self, title):
+        """The learned category id for `title`, or None. Never queries."""
+        merchant = normalize_merchant(title)
+        return _cache.get(self._key(merchant)) if merchant else None
+
+
+def learn(user, pairs):
+    """
+    Remembers (title, category_id) pairs from a user's re-categorization, in
+    one upsert. Later pairs for the same merchant win.
+    """
+    learned = {}
+    for title, category_id in pairs:
+        merchant = normalize_merchant(title)
+        if merchant and category_id:
+            learned[merchant] = category_id
+    if not learned:
+        return
+
+    now = timezone.now()
+    MerchantCategory.objects.bulk_create(
+        [MerchantCategory(user=user, merchant=merchant, category_id=category_id, updated_at=now) for merchant, category_id in learned.items()],
+        update_conflicts=True,
+        unique_fields=['user', 'merchant'],
+        update_fields=['category', 'updated_at'],
+    )
+    stats_cache.bump_merchant_generation(user)
+
+
+def recategorized(before, after):
+    """(title, category_id) pairs for the rows whose category a user changed."""
+    return [
+        (old.title, new.category_id)
+        for old, new in zip(before, after)
+        if new.category_id and new.category_id != old.category_id
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0.2 on 2026-10-18 11:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_counters(apps, schema_editor):
+    DailyRollup = apps.get_model('expenses', 'DailyRollup')
+    MonthlySpend = apps.get_model('expenses', 'MonthlySpend')
+    rows = (
+        DailyRollup.objects
+        .filter(transaction_type='expense')
+        .annotate(month=TruncMonth('day'))
+        .values('user_id', 'month')
+        .annotate(amount=Sum('total'))
+        .order_by()
+    )
+    MonthlySpend.objects.bulk_create(
+        [MonthlySpend(**row) for row in rows.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_dailyrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('alert_level', models.PositiveSmallIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_spend', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'month'), name='unique_monthly_spend')],
+            },
+        ),
+        migrations.RunPython(build_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-18 11:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0009_transaction_notification_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'payment_method', 'date'], name='txn_user_method_date'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 6.0.2 on 2026-10-18 11:40
+
+from django.db import migrations
+
+# The text index lives outside the ORM, so every write path (including
+# bulk_create and raw deletes) keeps it in sync: SQLite through FTS5
+# triggers, PostgreSQL through an expression GIN index that always
+# matches the row.
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE expenses_transaction_fts USING fts5(
+        title, description,
+        content='expenses_transaction', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER expenses_transaction_fts_ai AFTER INSERT ON expenses_transaction BEGIN
+        INSERT INTO expenses_transaction_fts(rowid, title, description)
+        VALUES (new.id, new.title, coalesce(new.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER expenses_transaction_fts_ad AFTER DELETE ON expenses_transaction BEGIN
+        INSERT INTO expenses_transaction_fts(expenses_transaction_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, coalesce(old.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER expenses_transaction_fts_au AFTER UPDATE OF title, description ON expenses_transaction BEGIN
+        INSERT INTO expenses_transaction_fts(expenses_transaction_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, coalesce(old.description, ''));
+        INSERT INTO expenses_transaction_fts(rowid, title, description)
+        VALUES (new.id, new.title, coalesce(new.description, ''));
+    END
+    """,
+    "INSERT INTO expenses_transaction_fts(expenses_transaction_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS expenses_transaction_fts_au",
+    "DROP TRIGGER IF EXISTS expenses_transaction_fts_ad",
+    "DROP TRIGGER IF EXISTS expenses_transaction_fts_ai",
+    "DROP TABLE IF EXISTS expenses_transaction_fts",
+]
+
+POSTGRES_FORWARD = [
+    """
+    CREATE INDEX IF NOT EXISTS expenses_transaction_search_gin ON expenses_transaction
+    USING GIN (to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, '')))
+    """,
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS expenses_transaction_search_gin",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_FORWARD)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_REVERSE)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0010_transaction_payment_method_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
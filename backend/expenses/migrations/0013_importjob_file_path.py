@@ -0,0 +1,22 @@
+# Generated by Django 6.0.2 on 2026-10-18 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0012_importjob'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='importjob',
+            name='file_data',
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='file_path',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 6.0.2 on 2026-10-18 11:52
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0014_transaction_fingerprint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='file_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='preview',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='StagedStatement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_hash', models.CharField(max_length=64)),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('committed_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='staged_statements', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StagedRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('date', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('expense', 'Expense'), ('income', 'Income')], max_length=10)),
+                ('category_name', models.CharField(default='General', max_length=100)),
+                ('staged', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='expenses.stagedstatement')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='staged',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='expenses.stagedstatement'),
+        ),
+        migrations.AddIndex(
+            model_name='stagedstatement',
+            index=models.Index(fields=['expires_at'], name='staged_expires'),
+        ),
+        migrations.AddConstraint(
+            model_name='stagedstatement',
+            constraint=models.UniqueConstraint(fields=('user', 'file_hash'), name='staged_user_file_hash'),
+        ),
+        migrations.AddConstraint(
+            model_name='stagedrow',
+            constraint=models.UniqueConstraint(fields=('staged', 'position'), name='stagedrow_staged_position'),
+        ),
+    ]
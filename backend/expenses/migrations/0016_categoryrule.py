@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-18 11:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0015_statement_staging'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=100, unique=True)),
+                ('priority', models.SmallIntegerField(default=0)),
+                ('whole_word', models.BooleanField(default=False)),
+                ('transaction_type', models.CharField(blank=True, choices=[('expense', 'Expense'), ('income', 'Income')], default='', max_length=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rules', to='expenses.category')),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0019_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='importjob',
+            name='password',
+        ),
+    ]
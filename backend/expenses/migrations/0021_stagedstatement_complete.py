@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_existing_complete(apps, schema_editor):
+    # Statements were staged in one transaction until now, so every existing one is whole
+    StagedStatement = apps.get_model('expenses', 'StagedStatement')
+    StagedStatement.objects.update(complete=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0020_remove_importjob_password'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='stagedstatement',
+            name='staged_user_file_hash',
+        ),
+        migrations.AddField(
+            model_name='stagedstatement',
+            name='complete',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_existing_complete, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='stagedstatement',
+            constraint=models.UniqueConstraint(condition=models.Q(('complete', True)), fields=('user', 'file_hash'), name='staged_user_file_hash'),
+        ),
+    ]
@@ -1,5 +1,8 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 
 class PaymentMethod(models.Model):
@@ -36,10 +39,90 @@ class Transaction(models.Model):
     payment_method = models.ForeignKey(PaymentMethod, on_delete=models.SET_NULL, null=True, blank=True)
     date = models.DateTimeField(default=timezone.now)
     description = models.TextField(blank=True, null=True)
+    fingerprint = models.CharField(max_length=64, blank=True, null=True, editable=False) # See expenses.fingerprints; null for manual entries
+
+    class Meta:
+        # Hot queries filter on user plus a half-open local date range,
+        # usually narrowed by type or category; keep date last so the
+        # range and the -date ordering can both use the index
+        indexes = [
+            models.Index(fields=['user', 'date'], name='txn_user_date'),
+            models.Index(fields=['user', 'transaction_type', 'date'], name='txn_user_type_date'),
+            models.Index(fields=['user', 'category', 'date'], name='txn_user_category_date'),
+            models.Index(fields=['user', 'payment_method', 'date'], name='txn_user_method_date'),
+        ]
+        constraints = [
+            # Partial, so manual entries (no fingerprint) stay out of the index
+            models.UniqueConstraint(
+                fields=['fingerprint'], condition=models.Q(fingerprint__isnull=False), name='txn_fingerprint_unique',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.amount}"
 
+class CategoryRule(models.Model):
+    """
+    An extra keyword -> category rule for expenses.categorizer, on top of
+    the built-in ones. Lower priority values win; built-ins start at 10.
+    """
+    keyword = models.CharField(max_length=100, unique=True)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='rules')
+    priority = models.SmallIntegerField(default=0)
+    whole_word = models.BooleanField(default=False) # Otherwise only the start of a word has to match
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES, blank=True, default='') # Blank matches any type
+    is_active = models.BooleanField(default=True)
+
+    def save(self, *args, **kwargs):
+        self.keyword = ' '.join(self.keyword.split()).lower()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.keyword} -> {self.category.name}"
+
+class MerchantCategory(models.Model):
+    """
+    A category a user picked for a merchant, learned from their edits and
+    applied before the keyword rules on later imports (expenses.merchants).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='merchant_categories')
+    merchant = models.CharField(max_length=100) # merchants.normalize_merchant() of the title
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'merchant'], name='merchant_user_merchant'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.merchant} -> {self.category.name}"
+
+class DailyRollup(models.Model):
+    """
+    Per-user totals for one local (Asia/Kolkata) day, split by type, category
+    and payment method. Maintained by expenses.rollups on every write path so
+    the dashboard reads O(days) rows instead of the whole transaction history.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    day = models.DateField()
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    payment_method = models.ForeignKey(PaymentMethod, on_delete=models.SET_NULL, null=True, blank=True)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'day', 'transaction_type', 'category', 'payment_method'],
+                name='unique_daily_rollup',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} {self.day} {self.transaction_type}: {self.total}"
+
 class SavingsGoal(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
@@ -61,6 +144,164 @@ class MonthlyBudget(models.Model):
     def __str__(self):
         return f"{self.user.username}'s Budget: {self.amount}"
 
+class MonthlySpend(models.Model):
+    """
+    Running expense total per user and local month, moved with F() deltas on
+    every write so budget alerts never re-sum the month.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_spend')
+    month = models.DateField() # First day of the local month
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    alert_level = models.PositiveSmallIntegerField(default=0) # Highest budget threshold (%) already notified
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='unique_monthly_spend'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} {self.month:%Y-%m}: {self.amount}"
+
+class StagedStatement(models.Model):
+    """
+    Rows parsed from one statement file, keyed by the SHA-256 of its bytes,
+    so previews can be committed and identical re-uploads imported without
+    running pdfplumber again. Expires after STATEMENT_STAGING_TTL.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='staged_statements')
+    file_hash = models.CharField(max_length=64)
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    row_count = models.PositiveIntegerField(default=0)
+    complete = models.BooleanField(default=False) # Set once every row is stored
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    committed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            # Workers staging the same file concurrently each fill their own copy; the first to complete wins
+            models.UniqueConstraint(fields=['user', 'file_hash'], condition=models.Q(complete=True), name='staged_user_file_hash'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='staged_expires'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.file_hash[:12]} ({self.row_count} rows)"
+
+class StagedRow(models.Model):
+    staged = models.ForeignKey(StagedStatement, on_delete=models.CASCADE, related_name='rows')
+    position = models.PositiveIntegerField()
+    title = models.CharField(max_length=255)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    date = models.DateField()
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    category_name = models.CharField(max_length=100, default='General')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['staged', 'position'], name='stagedrow_staged_position'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {self.amount}"
+
+class ImportJob(models.Model):
+    """
+    A queued bank statement import. The upload endpoint spools the PDF to
+    IMPORT_SPOOL_DIR and records it here; the process_import_jobs worker
+    parses it into a StagedStatement and, unless it's a preview, imports it.
+    """
+    STATUSES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='import_jobs')
+    status = models.CharField(max_length=10, choices=STATUSES, default='queued')
+    file_name = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=500, blank=True, default='') # Spooled upload (and its password file), deleted once the job finishes
+    file_hash = models.CharField(max_length=64, blank=True, default='') # SHA-256 of the upload
+    preview = models.BooleanField(default=False) # Stage the rows only, commit later
+    staged = models.ForeignKey(StagedStatement, on_delete=models.SET_NULL, blank=True, null=True, related_name='jobs')
+    progress = models.PositiveSmallIntegerField(default=0) # Percent of pages parsed
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    message = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='importjob_status_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.file_name} ({self.status})"
+
+class SmsInbox(models.Model):
+    """
+    A raw sms_webhook payload, stored as received so the webhook can answer
+    right away. The process_sms_inbox worker drains pending entries in
+    batches; entries that keep failing end up 'dead' for inspection.
+    """
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('dead', 'Dead'),
+    ]
+
+    payload = models.TextField() # Request body as received
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claim = models.CharField(max_length=32, blank=True, default='') # Batch token of the worker processing it
+    result = models.JSONField(blank=True, null=True) # sms_webhook's answer once processed
+    last_error = models.TextField(blank=True, default='')
+    received_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name_plural = "SMS inbox"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='smsinbox_status_due'),
+        ]
+
+    def __str__(self):
+        return f"SMS #{self.pk} ({self.status})"
+
+class IdempotencyKey(models.Model):
+    """
+    The stored response of a request sent with an Idempotency-Key (see
+    expenses.idempotency). A replay within the TTL gets this response back
+    instead of running again; `manage.py prune_idempotency_keys` deletes
+    expired keys.
+    """
+    scope = models.CharField(max_length=50) # Endpoint, plus the user where there is one
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64) # SHA-256 of the request, to reject a reused key
+    response_status = models.PositiveSmallIntegerField()
+    response_body = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='idempotency_scope_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key}"
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     avatar_url = models.CharField(max_length=255, blank=True, null=True)
@@ -85,6 +326,9 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_read', 'created_at'], name='notif_user_read_created'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.title}"
@@ -0,0 +1,97 @@
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .filters import get_ordering
+
+
+class TransactionCursorPagination(BasePagination):
+    """
+    Keyset pagination over (date, id), newest first unless the request asks
+    for ?ordering=date. Each page is a bounded
+    range scan on the (user, date) index, so deep pages cost the same as the
+    first one (no OFFSET).
+
+    Opt-in: a request is paginated when it sends `cursor`, `page_size` or
+    `paginate=true`, or when TRANSACTIONS_PAGINATE_BY_DEFAULT is on.
+    `paginate=false` always returns the full legacy list.
+    """
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    paginate_query_param = 'paginate'
+
+    def is_requested(self, request):
+        flag = request.query_params.get(self.paginate_query_param, '').lower()
+        if flag in ('0', 'false', 'no'):
+            return False
+        if flag in ('1', 'true', 'yes'):
+            return True
+        if self.cursor_query_param in request.query_params or self.page_size_query_param in request.query_params:
+            return True
+        return getattr(settings, 'TRANSACTIONS_PAGINATE_BY_DEFAULT', False)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, transaction):
+        raw = json.dumps([transaction.date.isoformat(), transaction.pk]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, encoded):
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            date, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return datetime.datetime.fromisoformat(date), int(pk)
+        except (TypeError, ValueError):
+            raise ValidationError({self.cursor_query_param: 'Invalid cursor.'})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        ordering = get_ordering(request.query_params)
+        queryset = queryset.order_by(*ordering)
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            date, pk = self.decode_cursor(encoded)
+            # Range on date first so the index bounds the scan, then
+            # break ties on id within the boundary timestamp
+            if ordering[0].startswith('-'):
+                queryset = queryset.filter(date__lte=date).filter(Q(date__lt=date) | Q(id__lt=pk))
+            else:
+                queryset = queryset.filter(date__gte=date).filter(Q(date__gt=date) | Q(id__gt=pk))
+
+        rows = list(queryset[:page_size + 1])
+        page = rows[:page_size]
+        self.next_cursor = self.encode_cursor(page[-1]) if len(rows) > page_size else None
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.paginate_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'results': data,
+        })
@@ -0,0 +1,36 @@
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+
+class CompactJSONRenderer(JSONRenderer):
+    """
+    Plain JSON, selected with ?format=compact. Views check
+    request.accepted_renderer.format to switch to their compact payload.
+    """
+    format = 'compact'
+
+
+class StreamingExportRenderer(BaseRenderer):
+    """
+    Negotiates ?format= for the export action, whose successful responses
+    stream on their own. Only error payloads (e.g. a rejected filter) are
+    rendered here, as JSON text.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, cls=encoders.JSONEncoder).encode()
+
+
+class CSVRenderer(StreamingExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(StreamingExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
@@ -0,0 +1,133 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.db import transaction as db_transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyRollup, Transaction
+
+# Days further apart than this are refreshed as separate ranges, so editing
+# one old transaction doesn't rebuild every day in between.
+MAX_RANGE_GAP_DAYS = 31
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def local_day(value):
+    """
+    Returns the local calendar day a transaction date falls on.
+    Parsers hand us plain dates, the ORM hands us aware datetimes.
+    """
+    if isinstance(value, datetime.datetime):
+        if timezone.is_naive(value):
+            return value.date()
+        return timezone.localdate(value)
+    return value
+
+
+def day_start(day):
+    """Aware datetime for local midnight at the start of `day`."""
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def local_range(first, last):
+    """
+    Half-open aware datetime range [first 00:00, day after last 00:00) in
+    local time. Filtering `date` with this keeps the column bare so the
+    composite (user, ..., date) indexes apply, unlike `date__date` lookups
+    which wrap it in a timezone conversion.
+    """
+    return day_start(first), day_start(last + datetime.timedelta(days=1))
+
+
+def _day_ranges(days):
+    days = sorted(set(days))
+    if not days:
+        return []
+
+    ranges = []
+    start = end = days[0]
+    for day in days[1:]:
+        if (day - end).days > MAX_RANGE_GAP_DAYS:
+            ranges.append((start, end))
+            start = day
+        end = day
+    ranges.append((start, end))
+    return ranges
+
+
+def _aggregate(queryset):
+    return (
+        queryset
+        .annotate(day=TruncDate('date'))
+        .values('user_id', 'day', 'transaction_type', 'category_id', 'payment_method_id')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+
+
+def _to_rollup(row):
+    return DailyRollup(
+        user_id=row['user_id'],
+        day=row['day'],
+        transaction_type=row['transaction_type'],
+        category_id=row['category_id'],
+        payment_method_id=row['payment_method_id'],
+        total=row['total'] or 0,
+        count=row['count'],
+    )
+
+
+def refresh_days(user, days):
+    """
+    Recomputes the rollup rows for the given local days of one user.
+    Each touched range is rebuilt from its own transactions only, so the
+    cost depends on how much changed, not on the size of the history.
+
+    Refreshes of one user run one at a time, serialized on the user row.
+    Under READ COMMITTED a concurrent DELETE doesn't see rows another
+    refresh just inserted, so two unserialized refreshes of the same day
+    would both insert it (unique_daily_rollup) or leave a stale total.
+    """
+    ranges = _day_ranges(local_day(day) for day in days)
+    if not ranges:
+        return
+    with db_transaction.atomic():
+        User.objects.select_for_update().filter(pk=user.pk).values_list('pk').first()
+        for first, last in ranges:
+            start, end = local_range(first, last)
+            rows = _aggregate(Transaction.objects.filter(user=user, date__gte=start, date__lt=end))
+            DailyRollup.objects.filter(user=user, day__gte=first, day__lte=last).delete()
+            DailyRollup.objects.bulk_create([_to_rollup(row) for row in rows])
+
+
+def clear(user):
+    DailyRollup.objects.filter(user=user).delete()
+
+
+def rebuild(user=None):
+    """
+    Drops and recreates rollups from scratch, for one user or for everyone.
+    Returns the number of rollup rows written.
+    """
+    transactions = Transaction.objects.all()
+    rollups = DailyRollup.objects.all()
+    if user is not None:
+        transactions = transactions.filter(user=user)
+        rollups = rollups.filter(user=user)
+
+    written = 0
+    with db_transaction.atomic():
+        rollups.delete()
+        batch = []
+        for row in _aggregate(transactions).iterator(chunk_size=REBUILD_BATCH_SIZE):
+            batch.append(_to_rollup(row))
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                DailyRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        DailyRollup.objects.bulk_create(batch)
+        written += len(batch)
+    return written
@@ -0,0 +1,66 @@
+"""
+Ranked full-text search over transaction titles and descriptions.
+
+Backed by the index created in migration 0011: FTS5 (bm25 ranking) on
+SQLite and a GIN expression index (ts_rank) on PostgreSQL. Other backends
+fall back to an unranked icontains scan.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Transaction
+
+MAX_RESULTS = 100
+
+POSTGRES_DOCUMENT = "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, ''))"
+
+
+def search_terms(query):
+    # Only word characters reach the MATCH/tsquery syntax, every term is
+    # prefix-matched so "swig" finds "Swiggy"
+    return re.findall(r'\w+', query.lower())[:10]
+
+
+def _ranked_ids(user, terms, limit):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                """
+                SELECT t.id FROM expenses_transaction_fts
+                JOIN expenses_transaction t ON t.id = expenses_transaction_fts.rowid
+                WHERE expenses_transaction_fts MATCH %s AND t.user_id = %s
+                ORDER BY bm25(expenses_transaction_fts) LIMIT %s
+                """,
+                [' '.join(f'"{term}"*' for term in terms), user.pk, limit],
+            )
+        else:
+            cursor.execute(
+                f"""
+                SELECT id FROM expenses_transaction, to_tsquery('simple', %s) query
+                WHERE user_id = %s AND {POSTGRES_DOCUMENT} @@ query
+                ORDER BY ts_rank({POSTGRES_DOCUMENT}, query) DESC, date DESC LIMIT %s
+                """,
+                [' & '.join(f'{term}:*' for term in terms), user.pk, limit],
+            )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_transactions(user, query, limit=MAX_RESULTS):
+    """Returns the user's best matching transactions, best first."""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    limit = max(1, min(limit, MAX_RESULTS))
+    base = Transaction.objects.filter(user=user).select_related('category', 'payment_method')
+
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term) | Q(description__icontains=term)
+        return list(base.filter(condition).order_by('-date', '-id')[:limit])
+
+    ids = _ranked_ids(user, terms, limit)
+    rows = base.in_bulk(ids)
+    return [rows[pk] for pk in ids if pk in rows]
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Transaction, Category, PaymentMethod, SavingsGoal, UserProfile, Notification
+from .models import Transaction, Category, PaymentMethod, SavingsGoal, UserProfile, Notification, ImportJob, StagedStatement
 from django.contrib.auth.models import User
 
 class PaymentMethodSerializer(serializers.ModelSerializer):
@@ -31,6 +31,18 @@ class TransactionSerializer(serializers.ModelSerializer):
             'date', 'description'
         ]
 
+class TransactionListSerializer(TransactionSerializer):
+    """List rows skip the (deferred) free-text description."""
+    class Meta(TransactionSerializer.Meta):
+        fields = [field for field in TransactionSerializer.Meta.fields if field != 'description']
+
+class CompactTransactionSerializer(serializers.ModelSerializer):
+    """Rows for ?format=compact: related objects as ids, side-loaded separately."""
+    class Meta:
+        model = Transaction
+        fields = ['id', 'title', 'amount', 'transaction_type', 'category', 'payment_method', 'date']
+        read_only_fields = fields
+
 class SavingsGoalSerializer(serializers.ModelSerializer):
     class Meta:
         model = SavingsGoal
@@ -60,3 +72,20 @@ class NotificationSerializer(serializers.ModelSerializer):
         model = Notification
         fields = ['id', 'title', 'message', 'notification_type', 'is_read', 'created_at']
 
+class ImportJobSerializer(serializers.ModelSerializer):
+    staging_token = serializers.UUIDField(source='staged.token', read_only=True, default=None)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'file_name', 'status', 'preview', 'progress', 'created_count', 'skipped_count',
+            'message', 'staging_token', 'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = fields
+
+class StagedStatementSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StagedStatement
+        fields = ['token', 'row_count', 'created_at', 'expires_at', 'committed_at']
+        read_only_fields = fields
+
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Category, CategoryRule, MonthlyBudget, PaymentMethod
+from . import stats_cache
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=PaymentMethod)
+def reference_data_changed(sender, **kwargs):
+    # Categories and payment methods are shared, so every user's stats may change
+    stats_cache.bump_reference_generation()
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=CategoryRule)
+def category_rules_changed(sender, **kwargs):
+    # Rules carry category names, so renames recompile the categorizer too
+    stats_cache.bump_rules_generation()
+
+@receiver([post_save, post_delete], sender=MonthlyBudget)
+def monthly_budget_changed(sender, instance, **kwargs):
+    stats_cache.bump_generation(instance.user)
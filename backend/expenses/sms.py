@@ -0,0 +1,132 @@
+"""
+Logging of forwarded bank/UPI SMS messages.
+
+`ingest` handles any number of messages in one pass. It parses them all,
+resolves their categories (learned merchants first, see
+expenses.merchants) and payment methods once, and skips messages whose
+fingerprint is already logged, which makes a retried webhook a no-op. The
+rest is inserted with one bulk_create and reported to the ledger in one
+call. The single and batch webhooks share it.
+"""
+from django.utils import timezone
+
+from . import ledger, merchants
+from .fingerprints import fingerprint, insert_new
+from .importers import resolve_by_name, resolve_categories
+from .models import PaymentMethod, Transaction
+from .utils import parse_sms_content
+
+MAX_MESSAGES = 500
+
+# (sender substring, payment method, icon) checked in order; anything else is plain UPI
+SENDER_METHODS = [
+    ('SLICE', 'Slice', 'https://upload.wikimedia.org/wikipedia/en/thumb/9/91/Slice_logo.svg/1200px-Slice_logo.svg.png'),
+    ('PAYTM', 'Paytm', 'https://assetscdn1.paytm.com/images/catalog/view/310944/1697527183231.png'),
+    ('PHONEPE', 'PhonePe', 'https://download.logo.wine/logo/PhonePe/PhonePe-Logo.wine.png'),
+    ('GPAY', 'GPay', 'https://upload.wikimedia.org/wikipedia/commons/thumb/f/f2/Google_Pay_Logo.svg/2560px-Google_Pay_Logo.svg.png'),
+    ('HDFC', 'HDFC Bank', 'https://www.hdfcbank.com/static/brand/logo.png'),
+    ('SBI', 'SBI', 'https://upload.wikimedia.org/wikipedia/en/thumb/5/58/State_Bank_of_India_logo.svg/1200px-State_Bank_of_India_logo.svg.png'),
+    ('ICICI', 'ICICI Bank', 'https://upload.wikimedia.org/wikipedia/commons/1/12/ICICI_Bank_Logo.svg'),
+    ('AXIS', 'Axis Bank', 'https://upload.wikimedia.org/wikipedia/commons/thumb/3/30/Axis_Bank_logo.svg/2560px-Axis_Bank_logo.svg.png'),
+    ('KOTAK', 'Kotak Bank', 'https://upload.wikimedia.org/wikipedia/en/thumb/8/8f/Kotak_Mahindra_Bank_logo.svg/1200px-Kotak_Mahindra_Bank_logo.svg.png'),
+]
+DEFAULT_METHOD = ('UPI', '')
+
+
+class SmsBatchError(Exception):
+    """The request body itself is malformed (not a per-message problem)."""
+
+
+def messages_from(payload):
+    """The message list of a batch body: {"messages": [...]} or a bare list."""
+    messages = payload.get('messages') if isinstance(payload, dict) else payload
+    if not isinstance(messages, list) or not messages:
+        raise SmsBatchError('Provide a non-empty "messages" list')
+    if len(messages) > MAX_MESSAGES:
+        raise SmsBatchError(f'A batch can hold at most {MAX_MESSAGES} messages')
+    return messages
+
+
+def payment_method_for(sender):
+    """(name, icon) of the payment method an SMS sender stands for."""
+    sender = sender.upper()
+    for needle, name, icon in SENDER_METHODS:
+        if needle in sender:
+            return name, icon
+    return DEFAULT_METHOD
+
+
+def resolve_payment_methods(icons):
+    """
+    Maps payment method names to rows, creating the missing ones and filling
+    in missing icons from `icons` ({name: icon}) with one write each.
+    """
+    methods, _ = resolve_by_name(PaymentMethod, icons, lambda name: PaymentMethod(name=name, icon=icons[name]))
+    iconless = [method for name, method in methods.items() if not method.icon and icons[name]]
+    for method in iconless:
+        method.icon = icons[method.name]
+    if iconless:
+        PaymentMethod.objects.bulk_update(iconless, ['icon'])
+    return methods
+
+
+def _parse(message, now):
+    if not isinstance(message, dict) or not isinstance(message.get('body', ''), str):
+        return None, {'status': 'error', 'message': 'Expected an object with a "body" string'}
+    parsed = parse_sms_content(message.get('body', ''))
+    if not parsed:
+        return None, {'status': 'ignored', 'message': 'No transaction details found'}
+    sender = str(message.get('sender') or 'Unknown').upper()
+    return dict(parsed, sender=sender, title=parsed.get('title', 'Unknown Merchant'), date=now), None
+
+
+def ingest(user, messages):
+    """
+    Logs SMS messages ({"body", "sender"} dicts) for `user`. Returns one
+    result per message, in order: status 'success' (with the new id),
+    'duplicate' (with the id logged before), 'ignored' or 'error'.
+    """
+    now = timezone.now()
+    results, parsed_rows = [], []
+    for index, message in enumerate(messages):
+        row, result = _parse(message, now)
+        if row is not None:
+            row['fingerprint'] = fingerprint(user.pk, row['title'], row['amount'], now, 'sms')
+            parsed_rows.append((index, row))
+        results.append(result or {})
+    if not parsed_rows:
+        return results
+
+    learned = merchants.MerchantLookup(user, (row['title'] for _, row in parsed_rows))
+    for _, row in parsed_rows:
+        row['category_id'] = learned.category_id(row['title'])
+    categories = resolve_categories(row.get('category_name', 'General') for _, row in parsed_rows if row['category_id'] is None)
+    methods = resolve_payment_methods(dict(payment_method_for(row['sender']) for _, row in parsed_rows))
+
+    def build(row):
+        return Transaction(
+            user=user,
+            title=row['title'],
+            amount=row['amount'],
+            transaction_type='expense',
+            category_id=row['category_id'] or categories[row.get('category_name', 'General')].pk,
+            payment_method=methods[payment_method_for(row['sender'])[0]],
+            date=now,
+            description=f"Auto-logged from SMS: {row['sender']}",
+            fingerprint=row['fingerprint'],
+        )
+
+    existing, created = insert_new(
+        ((row['fingerprint'], row) for _, row in parsed_rows),
+        build,
+        on_created=lambda created: ledger.transactions_changed(user, added=created),
+    )
+    logged = {txn.fingerprint: txn.pk for txn in created}
+    for index, row in parsed_rows:
+        if row['fingerprint'] in logged:
+            # A message repeated within the batch is logged once, for its first copy
+            existing[row['fingerprint']] = logged.pop(row['fingerprint'])
+            results[index] = {'status': 'success', 'id': existing[row['fingerprint']]}
+        else:
+            results[index] = {'status': 'duplicate', 'id': existing[row['fingerprint']]}
+    return results
@@ -0,0 +1,109 @@
+"""
+Staging for parsed statements.
+
+The import worker parses each upload once into a StagedStatement keyed by
+(user, SHA-256 of the file bytes). A preview upload stops there and hands
+back the staging token; committing it, importing a plain upload, or
+re-uploading the same file reads the staged rows instead of running
+pdfplumber again. Staged statements expire after STATEMENT_STAGING_TTL.
+"""
+import datetime
+import itertools
+
+from django.conf import settings
+from django.db import IntegrityError, transaction as db_transaction
+from django.utils import timezone
+
+from .models import StagedRow, StagedStatement
+
+STAGE_BATCH_SIZE = 500
+
+
+def expiry(now=None):
+    return (now or timezone.now()) + datetime.timedelta(seconds=settings.STATEMENT_STAGING_TTL)
+
+
+def live(user):
+    """`user`'s completely stored, unexpired staged statements."""
+    return StagedStatement.objects.filter(user=user, complete=True, expires_at__gt=timezone.now())
+
+
+def find(user, file_hash):
+    """The live staged copy of this file for `user`, or None."""
+    if not file_hash:
+        return None
+    return live(user).filter(file_hash=file_hash).first()
+
+
+def get_by_token(user, token):
+    return live(user).filter(token=token).first()
+
+
+def _staged_row(staged, position, row):
+    return StagedRow(
+        staged=staged,
+        position=position,
+        title=row['title'][:255],
+        amount=row['amount'],
+        date=row['date'],
+        transaction_type=row['transaction_type'],
+        category_name=row.get('category_name', 'General'),
+    )
+
+
+def stage(user, file_hash, rows):
+    """
+    Stores parsed rows (any iterable, consumed in batches) and returns the
+    StagedStatement. Each batch commits on its own, so parsing (and the
+    progress it reports) never runs inside a long transaction holding the
+    write lock. The copy only becomes visible once complete; if another
+    worker completed the same file meanwhile, its copy wins and is
+    returned instead.
+    """
+    rows = iter(rows)
+    staged = StagedStatement.objects.create(user=user, file_hash=file_hash, expires_at=expiry())
+    try:
+        position = 0
+        while True:
+            batch = list(itertools.islice(rows, STAGE_BATCH_SIZE))
+            if not batch:
+                break
+            with db_transaction.atomic():
+                StagedRow.objects.bulk_create([_staged_row(staged, position + offset, row) for offset, row in enumerate(batch)])
+            position += len(batch)
+
+        with db_transaction.atomic():
+            # An expired copy may still be around until the next purge
+            StagedStatement.objects.filter(user=user, file_hash=file_hash, complete=True, expires_at__lte=timezone.now()).delete()
+            StagedStatement.objects.filter(pk=staged.pk).update(row_count=position, complete=True)
+    except IntegrityError:
+        staged.delete()
+        winner = find(user, file_hash)
+        if winner is None:
+            raise
+        return winner
+    except Exception:
+        # Incomplete copies left by a crashed worker go with the next purge
+        staged.delete()
+        raise
+    staged.row_count, staged.complete = position, True
+    return staged
+
+
+def staged_rows(staged, offset=0, limit=None):
+    """Yields the staged rows in statement order, in the shape the parser produces."""
+    rows = StagedRow.objects.filter(staged=staged, position__gte=offset).order_by('position')
+    if limit is not None:
+        rows = rows.filter(position__lt=offset + limit)
+    values = rows.values('title', 'amount', 'date', 'transaction_type', 'category_name')
+    yield from values.iterator(chunk_size=STAGE_BATCH_SIZE)
+
+
+def mark_committed(staged):
+    StagedStatement.objects.filter(pk=staged.pk).update(committed_at=timezone.now())
+
+
+def purge_expired(now=None):
+    """Deletes expired staged statements (and their rows). Returns how many."""
+    _, per_model = StagedStatement.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return per_model.get(StagedStatement._meta.label, 0)
@@ -0,0 +1,93 @@
+"""
+Synthetic Federal Bank statements, for tests and the parser benchmarks.
+
+The PDFs are written by hand (no PDF library needed): one ruled table per
+page with the bank's ten columns and a header row, which is what
+parse_federal_bank_statement expects from a real statement. A cell with
+newlines is drawn as several lines in a taller row, like the wrapped
+narrations of real statements.
+"""
+import datetime
+from decimal import Decimal
+
+HEADERS = ['Date', 'Value Date', 'Particulars', 'Tran Type', 'Tran ID', 'Cheque', 'Withdrawals', 'Deposits', 'Balance', 'DR/CR']
+
+COLUMN_WIDTHS = [55, 55, 150, 35, 50, 40, 55, 55, 60, 25]
+
+NARRATIONS = [
+    'UPI/ZOMATO/ORDER', 'UPI/AMAZON PAY/SHOPPING', 'UPI/UBER INDIA/RIDE', 'NETFLIX SUBSCRIPTION',
+    'APOLLO PHARMACY', 'AIRTEL RECHARGE', 'NEFT/SALARY/ACME LTD', 'UPI/LOCAL KIRANA',
+]
+
+
+def sample_rows(count, start=datetime.date(2026, 1, 1), opening_balance=Decimal('50000.00'), wrap_every=None):
+    """
+    `count` table rows with a running balance, roughly one every few hours.
+    With `wrap_every`, every wrap_every-th narration runs over two lines.
+    """
+    rows, balance = [], opening_balance
+    for i in range(count):
+        day = (start + datetime.timedelta(days=i // 6)).strftime('%d-%b-%Y').upper()
+        narration = f'{NARRATIONS[i % len(NARRATIONS)]}/{i}'
+        if wrap_every and i % wrap_every == 0:
+            narration += f'/\nREF {i:06d} BLR'
+        amount = Decimal(100 + (i * 37) % 900) + Decimal('0.50')
+        if 'SALARY' in narration:
+            balance += amount * 20
+            withdrawal, deposit = '', f'{amount * 20:,.2f}'
+        else:
+            balance -= amount
+            withdrawal, deposit = f'{amount:,.2f}', ''
+        rows.append((day, day, narration, 'TFR', f'S{i:07d}', '', withdrawal, deposit, f'{balance:,.2f}', 'CR'))
+    return rows
+
+
+def _escape(text):
+    return str(text).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _page_content(page_rows):
+    ops, top, height, leading = [], 760, 16, 8
+    table = [HEADERS] + [list(row) for row in page_rows]
+    xs = [20]
+    for width in COLUMN_WIDTHS:
+        xs.append(xs[-1] + width)
+    ys = [top]
+    for cells in table:
+        lines = max(str(cell).count('\n') for cell in cells) + 1
+        ys.append(ys[-1] - height - leading * (lines - 1))
+        for c, cell in enumerate(cells):
+            for n, text in enumerate(str(cell).split('\n')):
+                ops.append(f'BT /F1 6 Tf {xs[c] + 2} {ys[-2] - height + 5 - leading * n} Td ({_escape(text)}) Tj ET')
+    bottom = ys[-1]
+    for y in ys:
+        ops.append(f'{xs[0]} {y} m {xs[-1]} {y} l S')
+    for x in xs:
+        ops.append(f'{x} {top} m {x} {bottom} l S')
+    return '\n'.join(ops).encode()
+
+
+def statement_pdf(rows, rows_per_page=20):
+    """Builds a Federal Bank style statement PDF (ruled table, one header row per page)."""
+    pages = [rows[i:i + rows_per_page] for i in range(0, len(rows), rows_per_page)] or [[]]
+
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for page_rows in pages:
+        stream = _page_content(page_rows)
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % len(objects))
+        kids.append(len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(b'%d 0 R' % kid for kid in kids), len(kids))
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        out += b'%010d 00000 n \n' % offset
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
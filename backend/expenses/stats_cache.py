@@ -0,0 +1,154 @@
+"""
+Server-side cache for the read-heavy stats endpoints.
+
+Entries are keyed by (user, endpoint, query params, local date, data
+generation). Every write path bumps the user's generation through
+expenses.ledger (again once its transaction commits, see _bump), so stale
+entries are never read again and simply age out
+of the backend (which enforces MAX_ENTRIES with culling). The ETag is
+derived from the same key, which lets a conditional GET be answered with
+304 from the generation alone, without running any stats queries.
+"""
+import functools
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction as db_transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Category
+
+REFERENCE_SCOPE = 'reference'
+RULES_SCOPE = 'category-rules'
+
+
+def get_cache():
+    return caches[settings.STATS_CACHE_ALIAS]
+
+
+def _user_scope(user):
+    # date_joined guards against a recycled primary key picking up another
+    # account's entries (e.g. after a database reset)
+    return f"user:{user.pk}:{user.date_joined.timestamp()}"
+
+
+def _generation(scope):
+    cache = get_cache()
+    key = f"gen:{scope}"
+    generation = cache.get(key)
+    if generation is None:
+        # Missing or evicted: start a fresh generation that can't collide
+        # with any entry written before
+        generation = uuid.uuid4().hex
+        if not cache.add(key, generation, timeout=None):
+            generation = cache.get(key) or generation
+    return generation
+
+
+def _set_generation(scope):
+    get_cache().set(f"gen:{scope}", uuid.uuid4().hex, timeout=None)
+
+
+def _bump(scope):
+    _set_generation(scope)
+    if connection.in_atomic_block:
+        # Until the write commits, other connections still read the old rows
+        # and would cache them under the new generation; move it once more
+        # after the commit so those entries are never served
+        db_transaction.on_commit(lambda: _set_generation(scope))
+
+
+def bump_generation(user):
+    """Invalidates every cached stats response of one user."""
+    _bump(_user_scope(user))
+
+
+def bump_reference_generation():
+    """Invalidates every cached stats response (shared categories/methods changed)."""
+    _bump(REFERENCE_SCOPE)
+
+
+def rules_generation():
+    """Version of the categorization rules (see expenses.categorizer)."""
+    return _generation(RULES_SCOPE)
+
+
+def bump_rules_generation():
+    _bump(RULES_SCOPE)
+
+
+def merchant_generation(user):
+    """Version of one user's learned merchant categories (see expenses.merchants)."""
+    return _generation(f"merchants:{_user_scope(user)}")
+
+
+def bump_merchant_generation(user):
+    _bump(f"merchants:{_user_scope(user)}")
+
+
+def reference_categories():
+    """
+    Category id/name/icon/budget rows, cached under the reference generation
+    so any category write (which bumps it through signals) refreshes them.
+    """
+    cache = get_cache()
+    key = f"categories:{_generation(REFERENCE_SCOPE)}"
+    categories = cache.get(key)
+    if categories is None:
+        categories = list(Category.objects.order_by('id').values('id', 'name', 'icon', 'budget_limit'))
+        cache.set(key, categories, timeout=settings.STATS_CACHE_TIMEOUT)
+    return categories
+
+
+def response_key(user, endpoint, params):
+    params = sorted((key, tuple(values)) for key, values in params.lists())
+    raw = "|".join([
+        _user_scope(user),
+        endpoint,
+        repr(params),
+        str(timezone.localdate()),
+        _generation(_user_scope(user)),
+        _generation(REFERENCE_SCOPE),
+    ])
+    return "stats:" + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    return etag in [tag.strip() for tag in header.split(',')] or header.strip() == '*'
+
+
+def cached_stats(endpoint):
+    """
+    Decorator for stats actions. Serves 304 on a matching If-None-Match,
+    otherwise returns the cached payload or computes and stores it.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = response_key(request.user, endpoint, request.query_params)
+            etag = f'"{key[len("stats:"):][:32]}"'
+            headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+            if _etag_matches(request, etag):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            cache = get_cache()
+            data = cache.get(key)
+            if data is None:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, timeout=settings.STATS_CACHE_TIMEOUT)
+            else:
+                response = Response(data)
+
+            for header, value in headers.items():
+                response[header] = value
+            return response
+        return wrapper
+    return decorator
@@ -1,8 +1,34 @@
+import datetime
+import functools
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from decimal import Decimal
+from django.db import DatabaseError, connection, transaction as db_transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth.models import User
-from .models import Notification, MonthlyBudget, Category, PaymentMethod, Transaction, SavingsGoal
+from django.http import QueryDict
+from .categorizer import classify
+from .filters import filter_transactions
+from .fingerprints import existing_fingerprints, fingerprint
+from .importers import import_statement_rows, import_statement_stream
+from .rollups import day_start as rollup_day_start, local_range
+from .merchants import normalize_merchant
+from .models import Notification, MonthlyBudget, Category, CategoryRule, IdempotencyKey, MerchantCategory, PaymentMethod, Transaction, SavingsGoal, DailyRollup, MonthlySpend, ImportJob, SmsInbox, StagedStatement
+from . import aggregates, categorizer, idempotency, inbox, jobs, merchants, rollups, sms, staging
+from .statement_samples import sample_rows, statement_pdf
+from .utils import iter_federal_bank_statement, parse_federal_bank_statement, parse_natural_language_expense, parse_sms_content
+
 
 class NotificationTests(APITestCase):
 
@@ -99,6 +125,20 @@ class NotificationTests(APITestCase):
         self.assertEqual(notif_error.notification_type, 'error')
 
 
+    def test_budget_alert_from_smart_text_and_counter_follows_deletes(self):
+        """
+        Test that ingestion paths other than the viewset also run the budget check,
+        and that the month-to-date counter moves back when an expense is removed.
+        """
+        MonthlyBudget.objects.create(user=self.user, amount=1000)
+
+        response = self.client.post(reverse('expenses:parse_smart_text'), {'text': 'Spent 900 on groceries'}, format='json')
+        self.assertEqual(response.data['status'], 'success')
+        self.assertEqual(Notification.objects.filter(user=self.user, title='Budget Alert').count(), 1)
+
+        self.client.delete(reverse('expenses:transaction-detail', args=[response.data['transaction_id']]))
+        self.assertEqual(MonthlySpend.objects.get(user=self.user).amount, 0)
+
     def test_goal_achievement_notification(self):
         """
         Test that reaching a savings goal triggers a success notification.
@@ -127,3 +167,1132 @@ class NotificationTests(APITestCase):
         self.assertIsNotNone(notif_success, "Should satisfy the Goal Reached condition")
         self.assertIn("New Bike", notif_success.message)
         self.assertEqual(notif_success.notification_type, 'success')
+
+
+class RollupTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='roller', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.category = Category.objects.create(name='Food', is_income=False)
+        self.payment_method = PaymentMethod.objects.create(name='Cash')
+        self.url = reverse('expenses:transaction-list')
+
+    def post_transaction(self, amount, transaction_type='expense'):
+        return self.client.post(self.url, {
+            'title': 'Lunch',
+            'amount': amount,
+            'transaction_type': transaction_type,
+            'category_id': self.category.id,
+            'payment_method_id': self.payment_method.id,
+        }, format='json')
+
+    def test_rollups_follow_create_update_and_delete(self):
+        """
+        Test that every viewset write path keeps the daily rollup in step.
+        """
+        first = self.post_transaction(100).data['id']
+        self.post_transaction(50)
+        self.post_transaction(1000, transaction_type='income')
+
+        rollup = DailyRollup.objects.get(user=self.user, transaction_type='expense')
+        self.assertEqual(rollup.total, 150)
+        self.assertEqual(rollup.count, 2)
+
+        self.client.patch(reverse('expenses:transaction-detail', args=[first]), {'amount': 300}, format='json')
+        self.assertEqual(DailyRollup.objects.get(user=self.user, transaction_type='expense').total, 350)
+
+        self.client.delete(reverse('expenses:transaction-detail', args=[first]))
+        rollup = DailyRollup.objects.get(user=self.user, transaction_type='expense')
+        self.assertEqual((rollup.total, rollup.count), (50, 1))
+
+        response = self.client.get(reverse('expenses:transaction-dashboard-stats'))
+        self.assertEqual(float(response.data['income']), 1000)
+        self.assertEqual(float(response.data['expense']), 50)
+        self.assertEqual(float(response.data['weekly_spending'][-1]['amount']), 50)
+
+    @skipUnless(connection.features.has_select_for_update, 'Row locks need SELECT ... FOR UPDATE support')
+    def test_refresh_is_serialized_on_the_user_row(self):
+        with CaptureQueriesContext(connection) as queries:
+            rollups.refresh_days(self.user, [timezone.localdate()])
+        locks = [query['sql'] for query in queries if 'FOR UPDATE' in query['sql']]
+        self.assertEqual(len(locks), 1)
+        self.assertIn('auth_user', locks[0])
+
+    def test_rebuild_command_matches_incremental_rollups(self):
+        """
+        Test that rebuilding from scratch reproduces the incrementally maintained rows.
+        """
+        self.post_transaction(100)
+        self.post_transaction(1000, transaction_type='income')
+        expected = set(DailyRollup.objects.values_list('day', 'transaction_type', 'total', 'count'))
+
+        DailyRollup.objects.all().delete()
+        call_command('rebuild_rollups', stdout=StringIO())
+
+        self.assertEqual(set(DailyRollup.objects.values_list('day', 'transaction_type', 'total', 'count')), expected)
+
+    def test_dashboard_stats_query_count(self):
+        """
+        Test that the dashboard costs a fixed number of queries however much history there is:
+        one summary aggregate, the recent transactions and the budget.
+        """
+        MonthlyBudget.objects.create(user=self.user, amount=1000)
+        for amount in (100, 200, 300):
+            self.post_transaction(amount)
+        self.post_transaction(5000, transaction_type='income')
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('expenses:transaction-dashboard-stats'))
+
+        self.assertEqual(float(response.data['balance']), 4400)
+        self.assertEqual(response.data['month_change'], 100)
+        self.assertEqual(len(response.data['recent_transactions']), 4)
+        self.assertEqual(response.data['total_budget'], 1000.0)
+
+
+class StatsCacheTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='cacher', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('expenses:transaction-dashboard-stats')
+
+    def add_expense(self, amount):
+        self.client.post(reverse('expenses:transaction-list'), {
+            'title': 'Snacks', 'amount': amount, 'transaction_type': 'expense'
+        }, format='json')
+
+    def test_conditional_get_returns_304_without_queries(self):
+        """
+        Test that a repeated dashboard read is served from the ETag alone.
+        """
+        self.add_expense(100)
+        response = self.client.get(self.url)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+        self.assertEqual(cached.data['expense'], response.data['expense'])
+
+    def test_entries_cached_before_commit_are_not_served_after_it(self):
+        """
+        Test that stats cached while a write's transaction is still open (which
+        other connections compute from pre-commit rows) are dropped on commit.
+        """
+        self.add_expense(100)
+        with self.captureOnCommitCallbacks(execute=True):
+            with db_transaction.atomic():
+                self.add_expense(50)
+                during = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=during)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], during)
+        self.assertEqual(float(response.data['expense']), 150)
+
+    def test_writes_invalidate_cached_stats(self):
+        """
+        Test that adding a transaction changes the ETag and the served numbers.
+        """
+        self.add_expense(100)
+        etag = self.client.get(self.url)['ETag']
+
+        self.add_expense(50)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(float(response.data['expense']), 150)
+
+
+class TimeSeriesTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='charts', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.food = Category.objects.create(name='Food', is_income=False)
+        self.travel = Category.objects.create(name='Travel', is_income=False)
+        self.url = reverse('expenses:transaction-timeseries')
+
+    def add_expense(self, amount, date, category):
+        self.client.post(reverse('expenses:transaction-list'), {
+            'title': 'Spend', 'amount': amount, 'transaction_type': 'expense',
+            'category_id': category.id, 'date': date
+        }, format='json')
+
+    def test_months_of_different_years_stay_separate(self):
+        """
+        Test that January of two years lands in two buckets and empty months are zero-filled.
+        """
+        self.add_expense(100, '2025-01-15T10:00:00+05:30', self.food)
+        self.add_expense(40, '2026-01-03T23:30:00+05:30', self.travel)
+        # 00:15 IST on Feb 1st is still Jan 31st in UTC; it belongs to February locally
+        self.add_expense(60, '2026-02-01T00:15:00+05:30', self.food)
+
+        response = self.client.get(self.url, {'granularity': 'month', 'start': '2025-01-01', 'end': '2026-02-28', 'split': 'category'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        series = response.data['series']
+        self.assertEqual(len(series), 14)
+        self.assertEqual((series[0]['period'], series[0]['amount']), ('2025-01-01', 100.0))
+        self.assertEqual(series[1]['amount'], 0)
+        self.assertEqual((series[12]['period'], series[12]['split']), ('2026-01-01', {'Travel': 40.0}))
+        self.assertEqual(series[13]['amount'], 60.0)
+
+    def test_rejects_unknown_granularity(self):
+        response = self.client.get(self.url, {'granularity': 'fortnight'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_huge_ranges_are_rejected_before_building_buckets(self):
+        for granularity, start in (('day', '0001-01-01'), ('week', '0001-01-01'), ('month', '0001-01-01'), ('year', '2020-01-01')):
+            with mock.patch('expenses.aggregates.bucket_starts') as bucket_starts:
+                response = self.client.get(self.url, {'granularity': granularity, 'start': start, 'end': '9999-12-31'})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, granularity)
+            bucket_starts.assert_not_called()
+
+    def test_ranges_ending_in_the_last_calendar_year(self):
+        for granularity in aggregates.GRANULARITIES:
+            response = self.client.get(self.url, {'granularity': granularity, 'start': '9999-12-30', 'end': '9999-12-31'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK, granularity)
+            self.assertEqual(response.data['series'][-1]['amount'], 0)
+        self.assertEqual(len(aggregates.bucket_starts(datetime.date(9999, 12, 30), datetime.date(9999, 12, 31), 'day')), 2)
+
+
+class BudgetStatsTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='budgeter', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.categories = [Category.objects.create(name=f'Cat {i}', budget_limit=500) for i in range(10)]
+        self.url = reverse('expenses:category-budget-stats')
+
+    def test_budget_stats_is_one_grouped_query_per_month(self):
+        """
+        Test that spend for any month comes from a single query, regardless of category count.
+        """
+        self.client.post(reverse('expenses:transaction-list'), {
+            'title': 'Old dinner', 'amount': 120, 'transaction_type': 'expense',
+            'category_id': self.categories[3].id, 'date': '2025-03-10T20:00:00+05:30'
+        }, format='json')
+        self.client.get(self.url)  # warm the category reference cache
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'month': '2025-03'})
+
+        self.assertEqual(len(response.data), 10)
+        by_id = {row['id']: row for row in response.data}
+        self.assertEqual(by_id[self.categories[3].id]['amount'], 120.0)
+        self.assertEqual(by_id[self.categories[4].id]['amount'], 0.0)
+        self.assertEqual(self.client.get(self.url, {'month': '2025-04'}).data[3]['amount'], 0.0)
+
+    def test_rejects_malformed_month(self):
+        for month in ('March', '9999-12'):
+            response = self.client.get(self.url, {'month': month})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, month)
+        self.assertEqual(self.client.get(self.url, {'month': '9999-11'}).status_code, status.HTTP_200_OK)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plan assertions are written against SQLite')
+class IndexUsageTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='planner', password='password123')
+        self.category = Category.objects.create(name='Food', is_income=False)
+        self.start, self.end = local_range(datetime.date(2026, 3, 1), datetime.date(2026, 3, 31))
+
+    def test_type_and_date_range_uses_composite_index(self):
+        plan = Transaction.objects.filter(
+            user=self.user, transaction_type='expense', date__gte=self.start, date__lt=self.end
+        ).explain()
+        self.assertIn('txn_user_type_date', plan)
+
+    def test_category_and_date_range_uses_composite_index(self):
+        plan = Transaction.objects.filter(
+            user=self.user, category=self.category, date__gte=self.start, date__lt=self.end
+        ).explain()
+        self.assertIn('txn_user_category_date', plan)
+
+    def test_rollup_refresh_range_uses_user_date_index(self):
+        plan = Transaction.objects.filter(user=self.user, date__gte=self.start, date__lt=self.end).explain()
+        self.assertIn('txn_user_date', plan)
+
+
+class TransactionPaginationTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='pager', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('expenses:transaction-list')
+        same_moment = '2026-01-10T09:00:00+05:30'
+        for i in range(7):
+            Transaction.objects.create(user=self.user, title=f'Txn {i}', amount=10 + i, date=same_moment if i < 4 else f'2026-01-0{i}T09:00:00+05:30')
+
+    def test_unpaginated_list_by_default(self):
+        response = self.client.get(self.url)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 7)
+
+    def test_cursor_walks_every_row_once_in_date_id_order(self):
+        """
+        Test that pages follow (date, id) descending, including ties on the same timestamp.
+        """
+        seen = []
+        response = self.client.get(self.url, {'page_size': 3})
+        while True:
+            seen.extend(row['id'] for row in response.data['results'])
+            if not response.data['next_cursor']:
+                break
+            response = self.client.get(self.url, {'page_size': 3, 'cursor': response.data['next_cursor']})
+
+        expected = list(Transaction.objects.filter(user=self.user).order_by('-date', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('cursor', response.data)
+
+
+class TransactionListPayloadTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='lister', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('expenses:transaction-list')
+        self.categories = [Category.objects.create(name=f'Cat {i}') for i in range(3)]
+        self.method = PaymentMethod.objects.create(name='UPI')
+        for i in range(12):
+            Transaction.objects.create(
+                user=self.user, title=f'Txn {i}', amount=5, description='long note',
+                category=self.categories[i % 3], payment_method=self.method
+            )
+
+    def test_list_joins_related_rows_up_front(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual(response.data[0]['payment_method']['name'], 'UPI')
+        self.assertNotIn('description', response.data[0])
+
+    def test_compact_format_side_loads_related_objects(self):
+        """
+        Test that ?format=compact returns ids per row and each referenced category once.
+        """
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'format': 'compact'})
+
+        self.assertEqual(len(response.data['results']), 12)
+        row = response.data['results'][0]
+        self.assertIn(row['category'], response.data['categories'])
+        self.assertEqual(len(response.data['categories']), 3)
+        self.assertEqual(list(response.data['payment_methods']), [self.method.id])
+
+        paginated = self.client.get(self.url, {'format': 'compact', 'page_size': 2})
+        self.assertEqual(len(paginated.data['results']), 2)
+        self.assertIsNotNone(paginated.data['next_cursor'])
+
+
+class TransactionFilterTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='filterer', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('expenses:transaction-list')
+        self.food = Category.objects.create(name='Food')
+        self.travel = Category.objects.create(name='Travel')
+        rows = [
+            ('Lunch', 200, self.food, '2026-03-05T13:00:00+05:30'),
+            ('Dinner', 600, self.food, '2026-03-31T23:30:00+05:30'),
+            ('Cab', 300, self.travel, '2026-03-12T09:00:00+05:30'),
+            ('Breakfast', 80, self.food, '2026-04-01T08:00:00+05:30'),
+        ]
+        for title, amount, category, date in rows:
+            Transaction.objects.create(user=self.user, title=title, amount=amount, category=category, date=date)
+
+    def titles(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['title'] for row in response.data]
+
+    def test_category_in_a_month(self):
+        """
+        Test that "Food in March" uses local day boundaries (23:30 IST on the 31st is still March).
+        """
+        self.assertEqual(self.titles(category=self.food.id, date_from='2026-03-01', date_to='2026-03-31'), ['Dinner', 'Lunch'])
+
+    def test_multi_category_amount_range_and_ordering(self):
+        titles = self.titles(category=f'{self.food.id},{self.travel.id}', amount_min=100, amount_max=500, ordering='date')
+        self.assertEqual(titles, ['Lunch', 'Cab'])
+
+    def test_unindexed_ordering_is_rejected(self):
+        response = self.client.get(self.url, {'ordering': 'amount'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ordering', response.data)
+
+    def test_non_finite_amounts_are_rejected(self):
+        for params in ({'amount_min': 'nan'}, {'amount_max': 'Infinity'}, {'amount_min': '-inf'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(params)), response.data)
+
+    def test_dates_at_the_end_of_the_calendar(self):
+        self.assertEqual(self.titles(date_from='9999-12-31'), [])
+        for name, value in (('date_to', '9999-12-31'), ('date_from', '0001-01-01')):
+            response = self.client.get(self.url, {name: value})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(name, response.data)
+
+    def test_filtered_query_uses_composite_index(self):
+        params = QueryDict(f'category={self.food.id}&date_from=2026-03-01&date_to=2026-03-31')
+        queryset = filter_transactions(Transaction.objects.filter(user=self.user), params)
+        if connection.vendor == 'sqlite':
+            self.assertIn('txn_user_category_date', queryset.explain())
+
+
+class TransactionSearchTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='searcher', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('expenses:transaction-search')
+
+    def test_search_is_ranked_scoped_and_follows_writes(self):
+        """
+        Test prefix search over title and description, per-user scoping,
+        and that bulk inserts, edits and deletes reach the index.
+        """
+        other = User.objects.create_user(username='other', password='password123')
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, title='Swiggy dinner', amount=300),
+            Transaction(user=self.user, title='Groceries', amount=900, description='swiggy instamart run'),
+            Transaction(user=self.user, title='Uber', amount=150),
+            Transaction(user=other, title='Swiggy lunch', amount=200),
+        ])
+
+        titles = [row['title'] for row in self.client.get(self.url, {'q': 'swig'}).data]
+        self.assertEqual(titles, ['Swiggy dinner', 'Groceries'])
+
+        uber = Transaction.objects.get(title='Uber')
+        uber.title = 'Swiggy Genie'
+        uber.save()
+        Transaction.objects.filter(title='Groceries').delete()
+
+        titles = [row['title'] for row in self.client.get(self.url, {'q': 'swiggy'}).data]
+        self.assertEqual(sorted(titles), ['Swiggy Genie', 'Swiggy dinner'])
+
+    def test_empty_query_is_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'q': '  '}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TransactionExportTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='exporter', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('expenses:transaction-export')
+        food = Category.objects.create(name='Food')
+        Transaction.objects.create(user=self.user, title='=HYPERLINK("x")', amount=120, category=food, date='2026-03-05T13:00:00+05:30')
+        Transaction.objects.create(user=self.user, title='Salary', amount=50000, transaction_type='income', date='2026-03-01T09:00:00+05:30')
+
+    def test_csv_export_streams_filtered_rows(self):
+        response = self.client.get(self.url, {'type': 'expense'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,date,title,amount,transaction_type,category,payment_method,description')
+        self.assertEqual(len(lines), 2)
+        self.assertIn("'=HYPERLINK", lines[1])
+        self.assertIn('2026-03-05T13:00:00+05:30', lines[1])
+
+    def test_ndjson_export(self):
+        response = self.client.get(self.url, {'format': 'ndjson', 'ordering': 'date'})
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([record['title'] for record in records], ['Salary', '=HYPERLINK("x")'])
+        self.assertEqual(records[0]['amount'], '50000.00')
+
+    def test_bad_filter_is_reported(self):
+        response = self.client.get(self.url, {'ordering': 'amount'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TransactionBatchTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='batcher', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('expenses:transaction-batch')
+        self.category = Category.objects.create(name='Food')
+        self.keep = Transaction.objects.create(user=self.user, title='Keep', amount=10)
+        self.drop = Transaction.objects.create(user=self.user, title='Drop', amount=20)
+
+    def test_batch_applies_all_operations_with_one_budget_check(self):
+        MonthlyBudget.objects.create(user=self.user, amount=1000)
+        operations = [
+            {'op': 'create', 'data': {'title': f'Trip {i}', 'amount': 100, 'category_id': self.category.id}}
+            for i in range(9)
+        ]
+        operations += [
+            {'op': 'update', 'id': self.keep.id, 'data': {'amount': 15}},
+            {'op': 'delete', 'id': self.drop.id},
+        ]
+
+        response = self.client.post(self.url, {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['status'] for row in response.data['results']], ['created'] * 9 + ['updated', 'deleted'])
+
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 10)
+        self.assertEqual(Transaction.objects.get(pk=self.keep.pk).amount, 15)
+        self.assertEqual(Notification.objects.filter(user=self.user, title__startswith='Budget').count(), 1)
+        self.assertEqual(DailyRollup.objects.get(user=self.user, category=self.category).count, 9)
+
+    def test_invalid_item_rejects_the_whole_batch(self):
+        response = self.client.post(self.url, {'operations': [
+            {'op': 'create', 'data': {'title': 'Ok', 'amount': 5}},
+            {'op': 'create', 'data': {'title': 'No amount'}},
+            {'op': 'delete', 'id': 999999},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([row['status'] for row in response.data['results']], ['not_applied', 'error', 'error'])
+        self.assertIn('amount', response.data['results'][1]['errors'])
+        self.assertFalse(Transaction.objects.filter(title='Ok').exists())
+
+
+class StatementImportTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='password123')
+        Category.objects.create(name='Food')
+
+    def rows(self, count, day=10):
+        return [{
+            'title': f'UPI/ZOMATO/{i}',
+            'amount': Decimal('100.00') + i,
+            'date': datetime.date(2026, 2, day),
+            'transaction_type': 'expense',
+            'category_name': 'Food' if i % 2 else 'Shopping',
+        } for i in range(count)]
+
+    def test_reimport_skips_existing_and_in_file_duplicates(self):
+        rows = self.rows(5)
+        self.assertEqual(import_statement_rows(self.user, rows + rows[:1]), (5, 1))
+        self.assertEqual(import_statement_rows(self.user, rows), (0, 5))
+        self.assertEqual(Category.objects.filter(name='Shopping').count(), 1)
+        self.assertEqual(Transaction.objects.get(title='UPI/ZOMATO/0').date, rollup_day_start(datetime.date(2026, 2, 10)))
+
+    def test_query_count_does_not_grow_with_rows(self):
+        import_statement_rows(self.user, self.rows(1, day=1))  # create the categories and payment method
+        with CaptureQueriesContext(connection) as small:
+            import_statement_rows(self.user, self.rows(5, day=2))
+        with CaptureQueriesContext(connection) as large:
+            import_statement_rows(self.user, self.rows(100, day=3))
+        self.assertEqual(len(small), len(large))
+
+    def test_stream_skips_duplicates_across_chunks(self):
+        rows = self.rows(10)
+        self.assertEqual(import_statement_stream(self.user, iter(rows + rows[:3]), chunk_size=4), (10, 3))
+
+
+class ImportJobTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='uploader', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.rows = [
+            ('10-FEB-2026', '10-FEB-2026', f'UPI/ZOMATO/{i}', 'TFR', 'S1', '', '1,250.00', '', '5000.00', 'DR')
+            for i in range(25)
+        ]
+
+    def upload(self, data):
+        pdf = SimpleUploadedFile('statement.pdf', data, content_type='application/pdf')
+        return self.client.post(reverse('expenses:upload_statement'), {'file': pdf}, format='multipart')
+
+    def test_upload_is_queued_and_imported_by_worker(self):
+        """Uploading only enqueues; the worker imports and the job reports the result"""
+        response = self.upload(statement_pdf(self.rows))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'queued')
+        self.assertEqual(Transaction.objects.count(), 0)
+
+        call_command('process_import_jobs', '--once', stdout=StringIO())
+
+        job = self.client.get(reverse('expenses:import-job-detail', args=[response.data['job_id']])).data
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual((job['progress'], job['created_count'], job['skipped_count']), (100, 25, 0))
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 25)
+        self.assertEqual(ImportJob.objects.get(pk=job['id']).file_path, '')
+
+    def test_unparseable_file_fails_job(self):
+        response = self.upload(b'%PDF-1.4 not really a pdf %%EOF')
+        with self.assertLogs('expenses.jobs', 'ERROR') as logs:
+            self.assertEqual(jobs.process_pending(), 1)
+        self.assertIn(f"Import job {response.data['job_id']} failed", logs.output[0])
+        job = ImportJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.message, jobs.FAILED_MESSAGE)
+
+    def test_stale_running_job_is_requeued(self):
+        job = ImportJob.objects.create(user=self.user, file_name='a.pdf')
+        self.assertEqual(jobs.claim(), job.pk)
+        self.assertIsNone(jobs.claim())  # already running, nothing else queued
+        self.assertEqual(jobs.requeue_stale(now=timezone.now() + jobs.STALE_AFTER * 2), 1)
+        self.assertEqual(jobs.claim(), job.pk)
+        self.assertEqual(ImportJob.objects.get(pk=job.pk).attempts, 2)
+
+    def test_pdf_password_stays_out_of_the_database(self):
+        pdf = SimpleUploadedFile('statement.pdf', statement_pdf(self.rows), content_type='application/pdf')
+        response = self.client.post(reverse('expenses:upload_statement'), {'file': pdf, 'password': 's3cret'}, format='multipart')
+        job = ImportJob.objects.get(pk=response.data['job_id'])
+        self.assertNotIn('s3cret', json.dumps(ImportJob.objects.filter(pk=job.pk).values()[0], default=str))
+        self.assertEqual(os.stat(job.file_path + jobs.PASSWORD_SUFFIX).st_mode & 0o777, 0o600)
+
+        passwords = []
+        with mock.patch('expenses.jobs.iter_federal_bank_statement', side_effect=lambda path, password, **kwargs: passwords.append(password) or iter(())):
+            jobs.process_pending()
+        self.assertEqual(passwords, ['s3cret'])
+        self.assertFalse(os.path.exists(job.file_path + jobs.PASSWORD_SUFFIX))
+
+    def test_jobs_no_worker_picked_up_expire_with_their_files(self):
+        pdf = SimpleUploadedFile('statement.pdf', statement_pdf(self.rows), content_type='application/pdf')
+        response = self.client.post(reverse('expenses:upload_statement'), {'file': pdf, 'password': 's3cret'}, format='multipart')
+        file_path = ImportJob.objects.get(pk=response.data['job_id']).file_path
+
+        self.assertEqual(jobs.expire_queued(), 0)
+        self.assertEqual(jobs.expire_queued(now=timezone.now() + jobs.QUEUED_EXPIRY * 2), 1)
+        job = ImportJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual((job.status, job.message, job.file_path), ('failed', jobs.EXPIRED_MESSAGE, ''))
+        self.assertFalse(os.path.exists(file_path))
+        self.assertFalse(os.path.exists(file_path + jobs.PASSWORD_SUFFIX))
+
+    def test_jobs_are_private(self):
+        job = ImportJob.objects.create(user=User.objects.create_user(username='other', password='x'), file_name='a.pdf')
+        response = self.client.get(reverse('expenses:import-job-detail', args=[job.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(IMPORT_JOBS_EAGER=True)
+    def test_eager_mode_imports_during_upload(self):
+        response = self.upload(statement_pdf(self.rows))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 25)
+
+
+class StatementParserTests(APITestCase):
+
+    def test_parallel_extraction_matches_serial(self):
+        """Rows from the process pool come back complete and in page order"""
+        data = statement_pdf(sample_rows(40), rows_per_page=8)
+        pages = []
+        serial = parse_federal_bank_statement(BytesIO(data), None, workers=1)
+        parallel = parse_federal_bank_statement(
+            BytesIO(data), None, workers=2, progress=lambda done, total: pages.append(done),
+        )
+        self.assertEqual(len(serial), 40)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(pages[-1], 5)
+
+    def test_spawned_pool_workers_need_no_django_setup(self):
+        """Workers started with spawn (no inherited settings) still parse every range"""
+        data = statement_pdf(sample_rows(40), rows_per_page=8)
+        pages = []
+        spawn_pool = functools.partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context('spawn'))
+        with mock.patch('concurrent.futures.ProcessPoolExecutor', spawn_pool):
+            parallel = parse_federal_bank_statement(
+                BytesIO(data), None, workers=2, progress=lambda done, total: pages.append(done),
+            )
+        # Progress per range, not per page: nothing fell back to serial parsing
+        self.assertEqual(pages, [2, 4, 5])
+        self.assertEqual(parallel, parse_federal_bank_statement(BytesIO(data), None, workers=1))
+
+    def test_unusable_pool_falls_back_to_serial_parsing_with_a_warning(self):
+        data = statement_pdf(sample_rows(40), rows_per_page=8)
+        with mock.patch('concurrent.futures.ProcessPoolExecutor', side_effect=OSError('no semaphores')), \
+                self.assertLogs('expenses.utils', 'WARNING') as logs:
+            rows = parse_federal_bank_statement(BytesIO(data), None, workers=2)
+        self.assertEqual(rows, parse_federal_bank_statement(BytesIO(data), None, workers=1))
+        self.assertIn('parsing serially from page 1', logs.output[0])
+
+    def test_rows_stream_page_by_page(self):
+        """The first page's rows arrive before later pages are parsed"""
+        pages = []
+        rows = iter_federal_bank_statement(statement_pdf(sample_rows(25), rows_per_page=5), progress=lambda done, total: pages.append(done))
+        next(rows)
+        self.assertEqual(pages, [])
+        self.assertEqual(len(list(rows)), 24)
+        self.assertEqual(pages, [1, 2, 3, 4, 5])
+
+    @override_settings(STATEMENT_MAX_PAGES=2)
+    def test_page_cap_is_configurable(self):
+        self.assertEqual(len(parse_federal_bank_statement(BytesIO(statement_pdf(sample_rows(25), rows_per_page=5)), None)), 10)
+
+    def test_fast_extraction_matches_extract_table(self):
+        data = statement_pdf(sample_rows(30), rows_per_page=10)
+        self.assertEqual(
+            parse_federal_bank_statement(BytesIO(data), None, fast=True),
+            parse_federal_bank_statement(BytesIO(data), None, fast=False),
+        )
+
+    def test_fast_extraction_matches_extract_table_on_wrapped_narrations(self):
+        """Two-line narrations across several pages come out the same without any fallback"""
+        data = statement_pdf(sample_rows(45, wrap_every=3), rows_per_page=10)
+        table = parse_federal_bank_statement(BytesIO(data), None, fast=False)
+        with mock.patch('pdfplumber.page.Page.extract_table', side_effect=AssertionError('fell back to extract_table')):
+            fast = parse_federal_bank_statement(BytesIO(data), None, fast=True)
+        self.assertEqual(len(table), 45)
+        self.assertEqual(table[3]['title'], 'NETFLIX SUBSCRIPTION/3/ REF 000003 BLR')
+        self.assertEqual(fast, table)
+
+    def test_fast_extraction_falls_back_when_balances_break(self):
+        """A page whose balances don't carry over is re-read with extract_table"""
+        rows = sample_rows(30)
+        rows[15] = rows[15][:8] + ('1.00', 'CR')
+        data = statement_pdf(rows, rows_per_page=10)
+        fast = parse_federal_bank_statement(BytesIO(data), None, fast=True)
+        self.assertEqual(len(fast), 30)
+        self.assertEqual(fast, parse_federal_bank_statement(BytesIO(data), None, fast=False))
+
+
+class FingerprintTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='fingerprints', password='password123')
+
+    @override_settings(SMS_INBOX_EAGER=True)
+    def test_retried_sms_webhook_is_logged_once(self):
+        payload = {'body': 'Rs. 250.00 debited from a/c XX1234 to Zomato on 10-02-26', 'sender': 'HDFCBK'}
+        # Distinct keys get past the idempotency store to the fingerprint check
+        first = self.client.post(reverse('expenses:sms_webhook'), payload, format='json', HTTP_IDEMPOTENCY_KEY='first')
+        retry = self.client.post(reverse('expenses:sms_webhook'), payload, format='json', HTTP_IDEMPOTENCY_KEY='retry')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), {'status': 'duplicate', 'id': first.json()['id']})
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+
+    def test_import_skips_rows_that_differ_only_in_case_and_spacing(self):
+        row = {'title': 'UPI/ZOMATO  Order', 'amount': Decimal('99.5'), 'date': datetime.date(2026, 2, 1), 'transaction_type': 'expense'}
+        self.assertEqual(import_statement_rows(self.user, [row]), (1, 0))
+        self.assertEqual(import_statement_rows(self.user, [dict(row, title='upi/zomato order', amount=Decimal('99.50'))]), (0, 1))
+        self.assertEqual(len(Transaction.objects.get().fingerprint), 64)
+
+    def test_rows_lost_to_a_concurrent_import_are_not_counted(self):
+        rows = [
+            {'title': 'Coffee', 'amount': Decimal('150'), 'date': datetime.date(2026, 2, 1), 'transaction_type': 'expense'},
+            {'title': 'Uber', 'amount': Decimal('300'), 'date': datetime.date(2026, 2, 1), 'transaction_type': 'expense'},
+        ]
+        # Another upload of the same statement commits "Coffee" after this
+        # import looked the fingerprints up
+        import_statement_rows(self.user, rows[:1])
+        lookups = [{}]
+
+        def stale_then_fresh(fingerprints):
+            return lookups.pop() if lookups else existing_fingerprints(fingerprints)
+
+        with mock.patch('expenses.fingerprints.existing_fingerprints', side_effect=stale_then_fresh):
+            self.assertEqual(import_statement_rows(self.user, rows), (1, 1))
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+        # Each row reached the month-to-date counter once
+        self.assertEqual(MonthlySpend.objects.get(user=self.user).amount, Decimal('450'))
+
+    def test_sms_lost_to_a_concurrent_request_is_reported_as_duplicate(self):
+        messages = [
+            {'body': 'Rs. 250.00 debited from a/c XX1234 to Zomato on 10-02-26', 'sender': 'HDFCBK'},
+            {'body': 'Rs. 90.00 debited from a/c XX1234 to Uber on 10-02-26', 'sender': 'HDFCBK'},
+        ]
+        # Another webhook delivery logs the first message after this one looked it up
+        first = sms.ingest(self.user, messages[:1])[0]['id']
+        lookups = [{}]
+
+        def stale_then_fresh(fingerprints):
+            return lookups.pop() if lookups else existing_fingerprints(fingerprints)
+
+        with mock.patch('expenses.fingerprints.existing_fingerprints', side_effect=stale_then_fresh):
+            results = sms.ingest(self.user, messages)
+        self.assertEqual(results[0], {'status': 'duplicate', 'id': first})
+        self.assertEqual(results[1]['status'], 'success')
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(MonthlySpend.objects.get(user=self.user).amount, Decimal('340'))
+
+    def test_backfill_fills_legacy_rows_and_resumes(self):
+        day = rollup_day_start(datetime.date(2026, 2, 1))
+        bank_transfer = PaymentMethod.objects.create(name='Bank Transfer')
+        legacy = [
+            Transaction.objects.create(user=self.user, title='Coffee', amount=Decimal('150'), date=day, payment_method=bank_transfer)
+            for _ in range(2)
+        ] + [
+            Transaction.objects.create(user=self.user, title='Uber', amount=Decimal('300'), date=day, description='Auto-logged from SMS: UBER'),
+            Transaction.objects.create(user=self.user, title='Rent', amount=Decimal('9000'), date=day, description='Paid by hand'),
+        ]
+
+        call_command('backfill_fingerprints', '--batch-size', '2', '--after-id', str(legacy[0].pk), stdout=StringIO())
+        legacy = [Transaction.objects.get(pk=txn.pk) for txn in legacy]
+        self.assertIsNone(legacy[0].fingerprint)  # before --after-id
+        self.assertIsNotNone(legacy[1].fingerprint)
+
+        call_command('backfill_fingerprints', stdout=StringIO())
+        self.assertIsNone(Transaction.objects.get(pk=legacy[0].pk).fingerprint)  # duplicate of legacy[1]
+        self.assertEqual(legacy[2].fingerprint, fingerprint(self.user.pk, 'Uber', Decimal('300'), day, 'sms'))
+
+        row = {'title': 'Coffee', 'amount': Decimal('150'), 'date': datetime.date(2026, 2, 1), 'transaction_type': 'expense'}
+        self.assertEqual(import_statement_rows(self.user, [row]), (0, 1))
+
+        # Manual entries stay unfingerprinted and don't hide a statement line
+        self.assertIsNone(Transaction.objects.get(pk=legacy[3].pk).fingerprint)
+        self.assertEqual(import_statement_rows(self.user, [dict(row, title='Rent', amount=Decimal('9000'))]), (1, 0))
+
+
+class StatementPreviewTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='previewer', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.pdf = statement_pdf(sample_rows(12), rows_per_page=6)
+
+    def upload(self, preview=True):
+        pdf = SimpleUploadedFile('statement.pdf', self.pdf, content_type='application/pdf')
+        return self.client.post(reverse('expenses:upload_statement'), {'file': pdf, 'preview': preview}, format='multipart')
+
+    def stage(self):
+        job_id = self.upload().data['job_id']
+        jobs.process_pending()
+        return self.client.get(reverse('expenses:import-job-detail', args=[job_id])).data['staging_token']
+
+    def test_preview_then_commit_without_reparsing(self):
+        token = self.stage()
+        self.assertEqual(Transaction.objects.count(), 0)
+
+        preview = self.client.get(reverse('expenses:statement-preview-detail', args=[token]), {'limit': 5})
+        self.assertEqual(preview.data['row_count'], 12)
+        self.assertEqual(len(preview.data['rows']), 5)
+        self.assertFalse(any(row['duplicate'] for row in preview.data['rows']))
+
+        response = self.client.post(reverse('expenses:statement-preview-commit', args=[token]))
+        self.assertEqual((response.data['created_count'], response.data['skipped_count']), (12, 0))
+        preview = self.client.get(reverse('expenses:statement-preview-detail', args=[token]))
+        self.assertTrue(all(row['duplicate'] for row in preview.data['rows']))
+        self.assertIsNotNone(preview.data['committed_at'])
+
+    def test_identical_reupload_hits_the_staging_cache(self):
+        token = self.stage()
+        response = self.upload()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['status'], str(response.data['staging_token'])), ('staged', str(token)))
+        self.assertEqual(ImportJob.objects.count(), 1)
+
+        # A plain import of the same file reuses the staged rows: it succeeds
+        # even with the spooled PDF gone
+        job = ImportJob.objects.get(pk=self.upload(preview=False).data['job_id'])
+        jobs.discard(job.file_path)
+        jobs.process_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.created_count), ('done', 12))
+
+    def test_staged_statements_expire(self):
+        token = self.stage()
+        self.assertEqual(staging.purge_expired(now=timezone.now() + datetime.timedelta(days=2)), 1)
+        response = self.client.get(reverse('expenses:statement-preview-detail', args=[token]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(StagedStatement.objects.exists())
+
+    def test_rows_are_staged_outside_one_long_transaction(self):
+        """Parsing (and its progress writes) runs between the batch transactions, and the partial copy stays hidden"""
+        depth = len(connection.atomic_blocks)
+        seen = []
+
+        def rows():
+            for row in parse_federal_bank_statement(BytesIO(self.pdf), None):
+                seen.append((len(connection.atomic_blocks), staging.find(self.user, 'hash')))
+                yield row
+
+        with mock.patch.object(staging, 'STAGE_BATCH_SIZE', 5):
+            staged = staging.stage(self.user, 'hash', rows())
+        self.assertEqual(seen, [(depth, None)] * 12)
+        self.assertEqual((staged.row_count, staged.complete), (12, True))
+        self.assertEqual(staging.find(self.user, 'hash'), staged)
+
+    def test_failed_parse_leaves_no_staged_copy(self):
+        def rows():
+            yield from parse_federal_bank_statement(BytesIO(self.pdf), None)
+            raise ValueError('broken page')
+
+        with self.assertRaises(ValueError):
+            staging.stage(self.user, 'hash', rows())
+        self.assertFalse(StagedStatement.objects.exists())
+
+    def test_first_completed_copy_wins(self):
+        rows = parse_federal_bank_statement(BytesIO(self.pdf), None)
+        first = staging.stage(self.user, 'hash', rows)
+        self.assertEqual(staging.stage(self.user, 'hash', rows), first)
+        self.assertEqual(StagedStatement.objects.get().pk, first.pk)
+
+
+class CategorizerTests(APITestCase):
+
+    def test_keywords_match_at_word_starts_by_priority(self):
+        self.assertEqual(classify('UPI/OLA CABS/123'), 'Travel')
+        self.assertEqual(classify('COCA COLA BOTTLERS'), 'General')  # "ola" inside a word
+        self.assertEqual(classify('Restaurants and bills'), 'Food')  # Food outranks Bills
+        self.assertEqual(classify('NACH AUTO DEBIT NETFLIX'), 'Entertainment')
+
+    def test_income_rules_only_apply_to_income(self):
+        self.assertEqual(classify('NEFT/SALARY/ACME', 'income'), 'Income')
+        self.assertEqual(classify('NEFT/SALARY/ACME', 'expense'), 'General')
+
+    def test_all_parsers_share_the_engine(self):
+        self.assertEqual(parse_sms_content('Rs. 250.00 debited from a/c XX1234 to Swiggy on 10-02-26')['category_name'], 'Food')
+        self.assertEqual(parse_natural_language_expense('auto 50', None)['category_name'], 'Travel')
+        salary = parse_natural_language_expense('salary 50000', None)
+        self.assertEqual((salary['category_name'], salary['transaction_type']), ('Income', 'income'))
+
+    def test_transfer_keywords_need_a_known_income_row(self):
+        self.assertEqual(classify('NEFT/SALARY/ACME'), 'General')
+        self.assertEqual(parse_natural_language_expense('neft 5000 to landlord', None)['transaction_type'], 'expense')
+
+        user = User.objects.create_user(username='quick-add', password='password123')
+        self.client.force_authenticate(user=user)
+        response = self.client.post(reverse('expenses:parse_smart_text'), {'text': 'neft 5000 to landlord'}, format='json')
+        txn = Transaction.objects.get(pk=response.data['transaction_id'])
+        self.assertEqual((txn.transaction_type, txn.category.name), ('expense', 'General'))
+
+    def test_unreadable_rules_fall_back_to_builtins_once(self):
+        with mock.patch('expenses.categorizer._database_rules', side_effect=DatabaseError('no such table')) as rules, \
+                self.assertLogs('expenses.categorizer', 'WARNING'):
+            categorizer._engine = None
+            self.assertEqual(classify('swiggy order'), 'Food')
+            self.assertEqual(classify('swiggy order'), 'Food')
+        self.assertEqual(rules.call_count, 1)
+        categorizer._engine = None
+
+    def test_database_rules_recompile_the_engine(self):
+        groceries = Category.objects.create(name='Groceries')
+        rule = CategoryRule.objects.create(keyword='Kirana', category=groceries)
+        self.assertEqual(classify('UPI/LOCAL KIRANA/7'), 'Groceries')
+        rule.delete()
+        self.assertEqual(classify('UPI/LOCAL KIRANA/7'), 'General')
+
+
+class MerchantCategoryTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='merchants', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.groceries = Category.objects.create(name='Groceries')
+        self.row = {'title': 'UPI/LOCAL KIRANA/4821', 'amount': Decimal('120'), 'date': datetime.date(2026, 2, 1), 'transaction_type': 'expense'}
+
+    def test_normalize_merchant_drops_reference_numbers(self):
+        self.assertEqual(normalize_merchant('UPI/LOCAL KIRANA/4821'), 'upi local kirana')
+        self.assertEqual(normalize_merchant('upi-local  kirana 77'), 'upi local kirana')
+
+    def test_recategorizing_teaches_the_next_import(self):
+        import_statement_rows(self.user, [self.row])
+        txn = Transaction.objects.get(user=self.user)
+        self.assertEqual(txn.category.name, 'General')
+
+        self.client.patch(reverse('expenses:transaction-detail', args=[txn.pk]), {'category_id': self.groceries.pk}, format='json')
+        self.assertEqual(MerchantCategory.objects.get(user=self.user).merchant, 'upi local kirana')
+
+        import_statement_rows(self.user, [dict(self.row, title='UPI/LOCAL KIRANA/9930', date=datetime.date(2026, 2, 2))])
+        self.assertEqual(Transaction.objects.filter(user=self.user, category=self.groceries).count(), 2)
+
+    def test_batch_updates_teach_merchants(self):
+        import_statement_rows(self.user, [self.row])
+        txn = Transaction.objects.get(user=self.user)
+        self.client.post(reverse('expenses:transaction-batch'), {
+            'operations': [{'op': 'update', 'id': txn.pk, 'data': {'category_id': self.groceries.pk}}],
+        }, format='json')
+        self.assertEqual(MerchantCategory.objects.get(user=self.user).category, self.groceries)
+
+    def test_learned_categories_are_per_user(self):
+        other = User.objects.create_user(username='other-merchants', password='password123')
+        merchants.learn(other, [(self.row['title'], self.groceries.pk)])
+        import_statement_rows(self.user, [self.row])
+        self.assertEqual(Transaction.objects.get(user=self.user).category.name, 'General')
+
+    def test_import_looks_up_merchants_in_one_query(self):
+        merchants.learn(self.user, [('UPI/LOCAL KIRANA/1', self.groceries.pk)])
+        rows = [dict(self.row, title=f'UPI/SHOP {index}/{index}', date=datetime.date(2026, 2, 1 + index)) for index in range(20)]
+        lookup = merchants.MerchantLookup(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            lookup.preload(row['title'] for row in rows)
+        self.assertEqual(len(queries), 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIsNone(lookup.category_id('UPI/SHOP 3/3'))
+        self.assertEqual(len(queries), 0)
+
+    @override_settings(SMS_INBOX_EAGER=True)
+    def test_sms_webhook_uses_learned_category(self):
+        merchants.learn(self.user, [('Zomato', self.groceries.pk)])
+        payload = {'body': 'Rs. 250.00 debited from a/c XX1234 to Zomato on 10-02-26', 'sender': 'HDFCBK'}
+        response = self.client.post(reverse('expenses:sms_webhook'), payload, format='json')
+        self.assertEqual(Transaction.objects.get(pk=response.json()['id']).category, self.groceries)
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = merchants.LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+
+
+class SmsBatchTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='sms-batch', password='password123')
+        self.url = reverse('expenses:sms_webhook_batch')
+
+    def messages(self, count):
+        return [{'body': f'Rs. {100 + index}.00 debited from a/c XX1234 to Shop{index} on 10-02-26', 'sender': 'PAYTM'} for index in range(count)]
+
+    def test_reports_status_per_message(self):
+        zomato = {'body': 'Rs. 250.00 debited from a/c XX1234 to Zomato on 10-02-26', 'sender': 'HDFCBK'}
+        response = self.client.post(self.url, {'messages': [zomato, {'body': 'Your OTP is 1234'}, zomato, 'junk']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], ['success', 'ignored', 'duplicate', 'error'])
+        self.assertEqual(results[2]['id'], results[0]['id'])
+        txn = Transaction.objects.get(user=self.user)
+        self.assertEqual((txn.category.name, txn.payment_method.name), ('Food', 'HDFC Bank'))
+
+        retry = self.client.post(self.url, [zomato], format='json')
+        self.assertEqual(retry.json()['results'], [{'index': 0, 'status': 'duplicate', 'id': results[0]['id']}])
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        self.client.post(self.url, self.messages(2), format='json')  # creates the category and payment method
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, self.messages(5)[2:], format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(self.url, self.messages(40)[5:], format='json')
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 40)
+
+    def test_rejects_malformed_batches(self):
+        self.assertEqual(self.client.post(self.url, {'messages': []}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.url, 'not json', content_type='application/json').status_code, 400)
+
+
+class SmsInboxTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='sms-inbox', password='password123')
+        self.url = reverse('expenses:sms_webhook')
+        self.payload = {'body': 'Rs. 250.00 debited from a/c XX1234 to Zomato on 10-02-26', 'sender': 'HDFCBK'}
+
+    def test_webhook_only_queues_the_payload(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, self.payload, format='json')
+        self.assertEqual(response.status_code, 202)
+        # The idempotency key lookup plus the inbox and key inserts
+        self.assertEqual([query['sql'].split()[0] for query in queries if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))], ['SELECT', 'INSERT', 'INSERT'])
+        self.assertFalse(Transaction.objects.exists())
+
+        call_command('process_sms_inbox', '--once', stdout=StringIO())
+        entry = SmsInbox.objects.get(pk=response.json()['id'])
+        self.assertEqual(entry.status, 'done')
+        self.assertEqual(entry.result, {'status': 'success', 'id': Transaction.objects.get(user=self.user).pk})
+
+    def test_drain_logs_a_burst_in_one_batch(self):
+        for index in range(3):
+            self.client.post(self.url, dict(self.payload, body=f'Rs. {100 + index}.00 debited from a/c XX1234 to Shop{index} on 10-02-26'), format='json')
+        # The same SMS forwarded twice under different keys
+        self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='first')
+        self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='second')
+        self.assertEqual(inbox.process_pending(), 5)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(SmsInbox.objects.filter(result__status='duplicate').count(), 1)
+
+    def test_malformed_payload_is_dead_lettered(self):
+        self.client.post(self.url, 'not json', content_type='application/json')
+        inbox.process_pending()
+        entry = SmsInbox.objects.get()
+        self.assertEqual((entry.status, entry.attempts), ('dead', 1))
+        self.assertIn('Invalid JSON', entry.last_error)
+
+    def test_failures_are_retried_with_backoff_then_dead_lettered(self):
+        User.objects.all().delete()
+        self.client.post(self.url, self.payload, format='json')
+        inbox.process_pending()
+        entry = SmsInbox.objects.get()
+        self.assertEqual((entry.status, entry.attempts), ('pending', 1))
+        self.assertGreater(entry.next_attempt_at, timezone.now())
+        self.assertEqual(inbox.process_pending(), 0)  # not due yet
+
+        SmsInbox.objects.update(next_attempt_at=timezone.now(), attempts=inbox.MAX_ATTEMPTS - 1)
+        inbox.process_pending()
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'dead')
+        self.assertEqual(entry.last_error, 'No user available for SMS logging')
+
+    def test_ingest_errors_are_logged_and_retried(self):
+        self.client.post(self.url, self.payload, format='json')
+        with mock.patch('expenses.sms.ingest', side_effect=DatabaseError('database is locked')), \
+                self.assertLogs('expenses.inbox', 'ERROR') as logs:
+            inbox.process_pending()
+        entry = SmsInbox.objects.get()
+        self.assertEqual((entry.status, entry.last_error), ('pending', 'database is locked'))
+        self.assertIn(f'SMS inbox entry {entry.pk} failed', logs.output[0])
+
+    def test_stale_entries_are_requeued(self):
+        self.client.post(self.url, self.payload, format='json')
+        self.assertEqual(len(inbox.claim_batch()), 1)
+        self.assertEqual(inbox.requeue_stale(timezone.now() + inbox.STALE_AFTER * 2), 1)
+        self.assertEqual(inbox.process_pending(), 1)
+        self.assertEqual(SmsInbox.objects.get().status, 'done')
+
+
+class IdempotencyTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='idempotent', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('expenses:transaction-list')
+        self.data = {'title': 'Coffee', 'amount': '150.00', 'transaction_type': 'expense', 'date': '2026-02-01T10:00:00Z'}
+
+    def test_replayed_transaction_post_returns_the_stored_response(self):
+        first = self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        with CaptureQueriesContext(connection) as queries:
+            replay = self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((replay.status_code, replay.data), (201, first.data))
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertFalse(any(query['sql'].startswith('INSERT') for query in queries))
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+
+    def test_keys_are_scoped_per_user_and_checked_against_the_request(self):
+        self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        reused = self.client.post(self.url, dict(self.data, amount='99.00'), format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(reused.status_code, 422)
+
+        other = User.objects.create_user(username='idempotent-2', password='password123')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc').status_code, 201)
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_requests_without_a_key_are_not_stored(self):
+        self.client.post(self.url, self.data, format='json')
+        self.client.post(self.url, self.data, format='json')
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_sms_webhook_falls_back_to_sender_and_body(self):
+        url = reverse('expenses:sms_webhook')
+        payload = {'body': 'Rs. 250.00 debited from a/c XX1234 to Zomato on 10-02-26', 'sender': 'HDFCBK'}
+        first = self.client.post(url, payload, format='json')
+        replay = self.client.post(url, dict(payload, received_at='later'), format='json')
+        self.assertEqual((replay.status_code, replay.json()), (202, first.json()))
+        self.assertEqual(SmsInbox.objects.count(), 1)
+
+    def test_expired_keys_run_again_and_are_pruned(self):
+        self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual(self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc').status_code, 201)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+
+        IdempotencyKey.objects.create(scope='sms', key='old', request_hash='', response_status=202, response_body={}, expires_at=timezone.now())
+        call_command('prune_idempotency_keys', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['abc'])
+
@@ -11,6 +11,8 @@ router.register(r'payment-methods', views.PaymentMethodViewSet)
 router.register(r'savings-goals', views.SavingsGoalViewSet, basename='savings-goal')
 router.register(r'monthly-budget', views.MonthlyBudgetView, basename='monthly-budget')
 router.register(r'notifications', views.NotificationViewSet, basename='notification')
+router.register(r'import-jobs', views.ImportJobViewSet, basename='import-job')
+router.register(r'statement-previews', views.StatementPreviewViewSet, basename='statement-preview')
 
 
 from rest_framework_simplejwt.views import (
@@ -28,6 +30,7 @@ urlpatterns = [
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/webhook/sms/', views.sms_webhook, name='sms_webhook'),
+    path('api/webhook/sms/batch/', views.sms_webhook_batch, name='sms_webhook_batch'),
     path('api/reset-data/', views.reset_data, name='reset_data'),
     path('api/health-check/', views.health_check, name='health_check'),
     path('api/user/', views.current_user, name='current_user'),
@@ -1,6 +1,17 @@
+import bisect
+import contextlib
+import io
+import logging
+import mmap
+import os
 import re
 from decimal import Decimal
 
+from .categorizer import classify, get_engine, pin_engine
+
+logger = logging.getLogger(__name__)
+
+
 def parse_sms_content(body):
     """
     Parses SMS body to extract amount, merchant/beneficiary, and transaction type.
@@ -53,125 +64,369 @@ def parse_sms_content(body):
     data['title'] = merchant.title() # Use merchant name as title
     
     # Simple Auto-Categorization
-    category_map = {
-        'zomato': 'Food',
-        'swiggy': 'Food',
-        'uber': 'Travel',
-        'ola': 'Travel',
-        'rapido': 'Travel',
-        'amazon': 'Shopping',
-        'flipkart': 'Shopping',
-        'jio': 'Bills',
-        'airtel': 'Bills',
-        'netflix': 'Entertainment',
-    }
-    
-    data['category_name'] = 'General' # Default
-    for keyword, cat in category_map.items():
-        if keyword in merchant.lower():
-            data['category_name'] = cat
-            break
+    data['category_name'] = classify(merchant, 'expense')
 
     return data
 
-def parse_federal_bank_statement(pdf_file, user, password=''):
+# Below this many pages a process pool costs more to start than it saves
+PARALLEL_MIN_PAGES = 4
+
+# Page ranges handed to the pool ahead of the one being consumed
+PARALLEL_PREFETCH = 2
+
+
+def _max_pages():
+    from django.conf import settings
+
+    # Still capped to protect against massive PDF CPU DoS, but configurable
+    return getattr(settings, 'STATEMENT_MAX_PAGES', 40)
+
+
+def _statement_rows(table):
     """
-    Parses a Federal Bank PDF statement in-memory using pdfplumber.
-    Returns a list of parsed transaction dicts ready for insertion.
+    Turns one extracted Federal Bank table into parsed transaction dicts.
+
+    Authentic Federal Bank table structure:
+    0: Date | 1: Value Date | 2: Particulars | 3: Tran Type | 4: Tran ID | 5: Cheque Details | 6: Withdrawals | 7: Deposits | 8: Balance | 9: DR/CR
     """
-    import pdfplumber
     import datetime
-    
-    parsed_transactions = []
-    
-    # pdf_file is typically an InMemoryUploadedFile object in Django
-    with pdfplumber.open(pdf_file, password=password) as pdf:
-        # 7. Protect against massive PDF CPU DoS
-        pages_to_process = pdf.pages[:40] 
+
+    engine = get_engine() # Once per page, not per row
+    rows = []
+    for row in table:
+        # Basic cleaning
+        row = [str(cell).strip() if cell else "" for cell in row]
         
-        for page in pages_to_process:
-            table = page.extract_table()
-            if not table:
-                continue
-                
-            # Iterate through rows
-            # Authentic Federal Bank table structure:
-            # 0: Date | 1: Value Date | 2: Particulars | 3: Tran Type | 4: Tran ID | 5: Cheque Details | 6: Withdrawals | 7: Deposits | 8: Balance | 9: DR/CR
-            if not getattr(page, 'layout_checked', False):
-                # Sometimes pdfplumber extracts headers, sometimes it doesn't depending on the page
-                pass
-                
-            for row in table:
-                # Basic cleaning
-                row = [str(cell).strip() if cell else "" for cell in row]
-                
-                # Check if this row looks like a data row (usually starts with a date DD-MMM-YYYY like 10-FEB-2026)
-                if not row or len(row) < 9:
-                    continue
-                    
-                date_str = row[0]
+        # Check if this row looks like a data row (usually starts with a date DD-MMM-YYYY like 10-FEB-2026)
+        if not row or len(row) < 9:
+            continue
+            
+        date_str = row[0]
+        
+        # Verify date format DD-MMM-YYYY (e.g. 10-FEB-2026)
+        if not re.match(r'\d{2}-[A-Za-z]{3}-\d{4}', date_str):
+            continue
+        
+        try:
+            # Parse Date
+            txn_date = datetime.datetime.strptime(date_str, '%d-%b-%Y').date()
+            
+            # Particulars is at index 2
+            narration = row[2]
+            
+            # Replace newlines in narration (sometimes multi-line cells exist)
+            narration = " ".join(narration.split())
+            
+            # Withdrawals is at index 6, Deposits at index 7
+            withdrawal_str = row[6].replace(',', '')
+            deposit_str = row[7].replace(',', '')
+            
+            # Determine type and amount
+            amount = Decimal('0.00')
+            txn_type = None
+            
+            if withdrawal_str and withdrawal_str != '0' and withdrawal_str != '0.00' and withdrawal_str != '-':
+                amount = Decimal(withdrawal_str)
+                txn_type = 'expense'
+            elif deposit_str and deposit_str != '0' and deposit_str != '0.00' and deposit_str != '-':
+                amount = Decimal(deposit_str)
+                txn_type = 'income'
                 
-                # Verify date format DD-MMM-YYYY (e.g. 10-FEB-2026)
-                if not re.match(r'\d{2}-[A-Za-z]{3}-\d{4}', date_str):
-                    continue
+            # Basic Smart Categorization Logic
+            assigned_category = engine.classify(narration, txn_type)
                 
-                try:
-                    # Parse Date
-                    txn_date = datetime.datetime.strptime(date_str, '%d-%b-%Y').date()
-                    
-                    # Particulars is at index 2
-                    narration = row[2]
-                    
-                    # Replace newlines in narration (sometimes multi-line cells exist)
-                    narration = " ".join(narration.split())
-                    
-                    # Withdrawals is at index 6, Deposits at index 7
-                    withdrawal_str = row[6].replace(',', '')
-                    deposit_str = row[7].replace(',', '')
-                    
-                    # Determine type and amount
-                    amount = Decimal('0.00')
-                    txn_type = None
-                    
-                    if withdrawal_str and withdrawal_str != '0' and withdrawal_str != '0.00' and withdrawal_str != '-':
-                        amount = Decimal(withdrawal_str)
-                        txn_type = 'expense'
-                    elif deposit_str and deposit_str != '0' and deposit_str != '0.00' and deposit_str != '-':
-                        amount = Decimal(deposit_str)
-                        txn_type = 'income'
-                        
-                    # Basic Smart Categorization Logic
-                    assigned_category = 'General'
-                    narration_lower = narration.lower()
-                    
-                    if any(kw in narration_lower for kw in ['zomato', 'swiggy', 'eat', 'food', 'restaurant', 'cafe', 'mcdonald', 'kfc', 'domino']):
-                        assigned_category = 'Food'
-                    elif any(kw in narration_lower for kw in ['amazon', 'flipkart', 'myntra', 'shop', 'mart', 'supermarket', 'mall', 'store', 'reliance']):
-                        assigned_category = 'Shopping'
-                    elif any(kw in narration_lower for kw in ['uber', 'ola', 'rapido', 'irctc', 'ticket', 'flight', 'petrol', 'fuel', 'hpcl', 'bpcl', 'ioc']):
-                        assigned_category = 'Travel'
-                    elif any(kw in narration_lower for kw in ['netflix', 'spotify', 'prime', 'hotstar', 'movie', 'cinema', 'pvr']):
-                        assigned_category = 'Entertainment'
-                    elif any(kw in narration_lower for kw in ['hospital', 'pharmacy', 'clinic', 'medical', 'doctor', 'apollo', 'medplus']):
-                        assigned_category = 'Health'
-                    elif any(kw in narration_lower for kw in ['salary', 'neft', 'imps', 'tfr', 'credited']):
-                        assigned_category = 'Income' if txn_type == 'income' else 'General'
-                    elif any(kw in narration_lower for kw in ['bill', 'recharge', 'airtel', 'jio', 'vi', 'electricity', 'water', 'bescom']):
-                        assigned_category = 'Bills'
-                        
-                    if txn_type and amount > 0:
-                        parsed_transactions.append({
-                            'title': narration[:255], # Truncate title
-                            'amount': amount,
-                            'date': txn_date,
-                            'transaction_type': txn_type,
-                            'category_name': assigned_category
-                        })
-                except Exception as e:
-                    print(f"Failed to parse row: {row}. Error: {e}")
-                    continue
-
-    return parsed_transactions
+            if txn_type and amount > 0:
+                rows.append({
+                    'title': narration[:255], # Truncate title
+                    'amount': amount,
+                    'date': txn_date,
+                    'transaction_type': txn_type,
+                    'category_name': assigned_category
+                })
+        except Exception as e:
+            print(f"Failed to parse row: {row}. Error: {e}")
+            continue
+
+    return rows
+
+
+@contextlib.contextmanager
+def open_statement(source, password='', pages=None):
+    """
+    Opens a statement given as a file path, raw bytes or an open binary file.
+    Paths are memory-mapped, so the OS pages the document in as pdfplumber
+    reads it instead of the whole file being copied into RAM.
+    """
+    import pdfplumber
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with pdfplumber.open(mapped, password=password, pages=pages) as pdf:
+                yield pdf
+        return
+
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with pdfplumber.open(source, password=password, pages=pages) as pdf:
+        yield pdf
+
+
+# First word of each Federal Bank column header, left to right; a header
+# line is recognised when all ten appear in order on one line
+HEADER_FIRST_WORDS = ('date', 'value', 'particulars', 'tran', 'tran', 'cheque', 'withdrawals', 'deposits', 'balance', 'dr/cr')
+
+# Words whose tops are this close (in points) share a text line
+LINE_TOLERANCE = 3
+
+# Horizontal slack around the header when cropping pages to the table
+CROP_MARGIN = 20
+
+DATE_PATTERN = re.compile(r'\d{2}-[A-Za-z]{3}-\d{4}')
+
+EMPTY_AMOUNTS = ('', '0', '0.00', '-')
+
+
+def _text_lines(words):
+    lines = []
+    for word in sorted(words, key=lambda w: (w['top'], w['x0'])):
+        if lines and abs(word['top'] - lines[-1][0]['top']) <= LINE_TOLERANCE:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+    return lines
+
+
+def _column_layout(words, page):
+    """
+    Finds the Federal Bank header line among `words` and derives the column
+    x-boundaries from it: each split sits halfway between two neighbouring
+    header labels, so right-aligned amounts wider than their label still
+    land in the right column. Returns None when there is no header.
+    """
+    for line in _text_lines(words):
+        labels = []
+        for word in sorted(line, key=lambda w: w['x0']):
+            text = word['text'].lower()
+            if len(labels) < len(HEADER_FIRST_WORDS) and text == HEADER_FIRST_WORDS[len(labels)]:
+                labels.append([word['x0'], word['x1']])
+            elif labels:
+                labels[-1][1] = word['x1'] # Rest of a multi-word label ("Value Date")
+        if len(labels) == len(HEADER_FIRST_WORDS):
+            return {
+                'splits': [(left[1] + right[0]) / 2 for left, right in zip(labels, labels[1:])],
+                'bbox': (max(0, labels[0][0] - CROP_MARGIN), 0, min(page.width, labels[-1][1] + CROP_MARGIN), page.height),
+                'header_bottom': max(word['bottom'] for word in line),
+            }
+    return None
+
+
+def _words_to_table(words, splits):
+    """
+    Assigns words to columns by their x-centre and rebuilds the table rows
+    extract_table would return. Lines without a date that sit right under
+    a row (wrapped narration) are folded into it; anything else without a
+    date (headers, footers, summaries) is dropped.
+    """
+    table = []
+    previous_bottom = None
+    for line in _text_lines(words):
+        cells = [[] for _ in range(len(splits) + 1)]
+        for word in line:
+            cells[bisect.bisect(splits, (word['x0'] + word['x1']) / 2)].append(word['text'])
+        row = [' '.join(cell) for cell in cells]
+        top = min(word['top'] for word in line)
+        line_height = max(word['bottom'] - word['top'] for word in line)
+
+        if DATE_PATTERN.match(row[0]):
+            table.append(row)
+        elif table and not row[0] and previous_bottom is not None and top - previous_bottom < line_height:
+            table[-1] = [' '.join(filter(None, pair)) for pair in zip(table[-1], row)]
+        else:
+            previous_bottom = None
+            continue
+        previous_bottom = max(word['bottom'] for word in line)
+    return table
+
+
+def _amount(value):
+    value = value.replace(',', '')
+    return Decimal('0') if value in EMPTY_AMOUNTS else Decimal(value)
+
+
+def _check_balances(table, balance=None):
+    """
+    Validates fast-path rows: every amount parses, each row is exactly one
+    withdrawal or deposit, and each balance is the previous one minus the
+    withdrawal plus the deposit. Returns the closing balance; raises
+    ValueError (or InvalidOperation) when the columns don't add up.
+    """
+    for row in table:
+        withdrawal, deposit = _amount(row[6]), _amount(row[7])
+        if (withdrawal > 0) == (deposit > 0):
+            raise ValueError(f"Expected one of withdrawal/deposit in {row}")
+        closing = _amount(row[8]) * (-1 if row[9].upper() == 'DR' else 1)
+        if balance is not None and balance - withdrawal + deposit != closing:
+            raise ValueError(f"Balance doesn't carry over in {row}")
+        balance = closing
+    return balance
+
+
+def _fast_page_table(page, state):
+    """
+    Rebuilds the page's table from the text layer using the column layout
+    of the first header seen. Returns None when the page needs the full
+    extract_table treatment instead.
+    """
+    layout = state.get('layout')
+    if layout is None:
+        words = page.extract_words()
+        layout = state['layout'] = _column_layout(words, page)
+        if layout is None:
+            return None
+        words = [word for word in words if word['top'] >= layout['header_bottom']]
+    else:
+        words = page.crop(layout['bbox'], relative=False, strict=False).extract_words()
+
+    table = _words_to_table(words, layout['splits'])
+    if not table:
+        return None
+    try:
+        state['balance'] = _check_balances(table, state.get('balance'))
+    except (ValueError, ArithmeticError):
+        return None
+    return table
+
+
+def _page_rows(page, state=None):
+    """
+    Parses one page. With a fast-path `state` the table is rebuilt from
+    extract_words; pages that fail its validation fall back to
+    extract_table.
+    """
+    try:
+        table = _fast_page_table(page, state) if state is not None else None
+        if table is None:
+            if state is not None:
+                state['balance'] = None # Continuity restarts after a fallback page
+            table = page.extract_table()
+        return _statement_rows(table) if table else []
+    finally:
+        # Drop the page's chars/lines/layout objects before the next page
+        page.close()
+
+
+def _fast_state(fast):
+    return {} if fast else None
+
+
+# State for pool processes: each one opens the statement independently.
+# Everything a worker needs comes in through _init_page_worker, so workers
+# never read django.conf.settings or the database and also work when the
+# pool spawns them instead of forking (macOS default).
+_worker_statement = {}
+
+
+def _init_page_worker(source, password, fast, engine):
+    _worker_statement.update(source=source, password=password, fast=fast)
+    pin_engine(engine)
+
+
+def _extract_page_range(page_range):
+    start, stop = page_range
+    state = _fast_state(_worker_statement['fast'])
+    rows = []
+    with open_statement(_worker_statement['source'], _worker_statement['password'], pages=range(start + 1, stop + 1)) as pdf:
+        for page in pdf.pages:
+            rows.extend(_page_rows(page, state))
+    return rows
+
+
+def _page_ranges(total, workers):
+    # A few ranges per worker, so one slow range doesn't leave the others idle
+    size = max(1, -(-total // (workers * 2)))
+    return [(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+def _iter_pages_parallel(source, password, total, workers, progress=None, fast=True):
+    """
+    Fans page ranges out to a process pool and yields their rows in page
+    order, keeping only a few ranges in flight. Returns the first page not
+    yet yielded: `total` when done, or earlier when a pool can't be used
+    here (no multiprocessing support, sandboxed host, a crashed child) so
+    the caller can carry on serially from that page.
+    """
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+
+    ranges = deque(_page_ranges(total, workers))
+    done = 0
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), initializer=_init_page_worker, initargs=(source, password, fast, get_engine())) as pool:
+            pending = deque()
+            while ranges or pending:
+                while ranges and len(pending) < workers + PARALLEL_PREFETCH:
+                    page_range = ranges.popleft()
+                    pending.append((page_range, pool.submit(_extract_page_range, page_range)))
+                (start, stop), future = pending.popleft()
+                rows = future.result()
+                yield from rows
+                done = stop
+                if progress:
+                    progress(done, total)
+    except (BrokenProcessPool, NotImplementedError, OSError):
+        logger.warning("Parallel statement parsing unavailable, parsing serially from page %s", done + 1, exc_info=True)
+    return done
+
+
+def iter_federal_bank_statement(source, password='', progress=None, workers=None, fast=None):
+    """
+    Parses a Federal Bank PDF statement with pdfplumber, yielding parsed
+    transaction dicts page by page so memory stays bounded by one page,
+    not by the length of the statement.
+    `source` is a file path (memory-mapped), bytes or an open binary file.
+    `progress`, if given, is called as progress(pages_done, pages_total).
+
+    With more than one worker (default: settings.STATEMENT_PARSE_WORKERS)
+    page ranges are extracted in a process pool and merged in page order;
+    small statements and hosts without a usable pool are parsed serially.
+
+    With `fast` (default: settings.STATEMENT_FAST_EXTRACT, off) pages are read
+    from the text layer using the header's column positions, falling back
+    to extract_table for any page whose rows don't validate.
+    """
+    from django.conf import settings
+
+    if workers is None:
+        workers = getattr(settings, 'STATEMENT_PARSE_WORKERS', 1)
+    if fast is None:
+        fast = getattr(settings, 'STATEMENT_FAST_EXTRACT', False)
+
+    with open_statement(source, password) as pdf:
+        total = min(len(pdf.pages), _max_pages())
+
+        resume_at = 0
+        if workers > 1 and total >= PARALLEL_MIN_PAGES:
+            if not isinstance(source, (str, os.PathLike, bytes, bytearray)):
+                # Pool processes can't share an open file object
+                source.seek(0)
+                source = source.read()
+            resume_at = yield from _iter_pages_parallel(source, password, total, workers, progress, fast)
+
+        state = _fast_state(fast)
+        for page_number, page in enumerate(pdf.pages[resume_at:total], start=resume_at + 1):
+            yield from _page_rows(page, state)
+            if progress:
+                progress(page_number, total)
+
+
+def parse_federal_bank_statement(pdf_file, user, password='', progress=None, workers=None, fast=None):
+    """
+    Parses a Federal Bank PDF statement in-memory using pdfplumber.
+    Returns a list of parsed transaction dicts ready for insertion; use
+    iter_federal_bank_statement to stream large statements instead.
+    """
+    return list(iter_federal_bank_statement(pdf_file, password, progress=progress, workers=workers, fast=fast))
 
 def parse_natural_language_expense(text, user):
     """
@@ -226,16 +481,10 @@ def parse_natural_language_expense(text, user):
         raw_title = " ".join(title_words)
         result['title'] = raw_title.title()
         
-        # Categorize
-        if any(kw in raw_title for kw in ['zomato', 'swiggy', 'dinner', 'lunch', 'eat', 'food', 'restaurant', 'cafe', 'mcdonald', 'kfc', 'domino', 'coffee', 'tea', 'snacks', 'drink']):
-            result['category_name'] = 'Food'
-        elif any(kw in raw_title for kw in ['amazon', 'flipkart', 'myntra', 'shop', 'mart', 'supermarket', 'mall', 'store', 'reliance', 'grocery', 'groceries']):
-            result['category_name'] = 'Shopping'
-        elif any(kw in raw_title for kw in ['uber', 'ola', 'rapido', 'irctc', 'ticket', 'flight', 'petrol', 'fuel', 'hpcl', 'bpcl', 'ioc', 'cab', 'auto']):
-            result['category_name'] = 'Travel'
-        elif any(kw in raw_title for kw in ['netflix', 'spotify', 'movie', 'cinema']):
-            result['category_name'] = 'Entertainment'
-        elif 'salary' in raw_title:
+        # Categorize. Quick-add entries are expenses unless they name a
+        # salary; transfer words like "neft" say nothing about direction
+        result['category_name'] = classify(raw_title, 'expense')
+        if re.search(r'\bsalary\b', raw_title):
             result['category_name'] = 'Income'
             result['transaction_type'] = 'income'
             
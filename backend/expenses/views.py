@@ -1,15 +1,25 @@
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.db.models import Sum, F
-from .models import Transaction, Category, PaymentMethod, SavingsGoal, UserProfile, MonthlyBudget, Notification
+from .models import Transaction, Category, PaymentMethod, SavingsGoal, UserProfile, MonthlyBudget, Notification, DailyRollup, ImportJob
+from . import aggregates, batch, exports, ledger, merchants, search, stats_cache
+from .filters import TransactionFilterBackend, filter_transactions
+from .importers import mark_duplicates
+from .pagination import TransactionCursorPagination
+from .renderers import CompactJSONRenderer, CSVRenderer, NDJSONRenderer
+from rest_framework.settings import api_settings
 from django.contrib.auth.models import User
 from decimal import Decimal, InvalidOperation
-from rest_framework import status, viewsets, permissions
+import copy
+import datetime
+from rest_framework import mixins, status, viewsets, permissions
 from rest_framework.decorators import api_view, action, permission_classes
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from .serializers import (
     TransactionSerializer, CategorySerializer, PaymentMethodSerializer, 
-    SavingsGoalSerializer, MonthlyBudgetSerializer, UserSerializer, NotificationSerializer
+    SavingsGoalSerializer, MonthlyBudgetSerializer, UserSerializer, NotificationSerializer,
+    TransactionListSerializer, CompactTransactionSerializer, ImportJobSerializer, StagedStatementSerializer
 )
 
 @api_view(['GET'])
@@ -120,11 +130,23 @@ def stats_view(request):
 
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from .utils import parse_sms_content
+from . import idempotency, inbox, sms
 from .models import Transaction, Category, PaymentMethod, SavingsGoal
 from django.utils import timezone
 import json
 
+SMS_STATUS_CODES = {'success': 201, 'duplicate': 200, 'ignored': 200, 'error': 400}
+
+def sms_request_hash(payload):
+    """Hash of an SMS payload's sender and body, or of the raw text if it isn't a JSON object."""
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        return idempotency.request_hash([str(data.get('sender', '')), str(data.get('body', ''))])
+    return idempotency.request_hash(payload)
+
 @csrf_exempt
 def sms_webhook(request):
     """
@@ -136,95 +158,58 @@ def sms_webhook(request):
     }
     """
     if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            body = data.get('body', '')
-            sender = data.get('sender', 'Unknown')
-            
-            parsed = parse_sms_content(body)
-            if not parsed:
-                return JsonResponse({'status': 'ignored', 'message': 'No transaction details found'}, status=200)
-
-            # Find or Create User (Assuming single user for now or handled via token)
-            user = get_default_user()
-            
-            # Find or Create Category
-            category, _ = Category.objects.get_or_create(
-                name=parsed.get('category_name', 'General'),
-                defaults={'is_income': False}
-            )
-            
-            # Find or Create Payment Method (Based on sender if possible, else generic)
-            # Enhanced heuristic for various apps/banks
-            sender = sender.upper()
-            method_name = "UPI"
-            
-            if "SLICE" in sender: 
-                method_name = "Slice"
-                icon_url = "https://upload.wikimedia.org/wikipedia/en/thumb/9/91/Slice_logo.svg/1200px-Slice_logo.svg.png"
-            elif "PAYTM" in sender: 
-                method_name = "Paytm"
-                icon_url = "https://assetscdn1.paytm.com/images/catalog/view/310944/1697527183231.png"
-            elif "PHONEPE" in sender: 
-                method_name = "PhonePe"
-                icon_url = "https://download.logo.wine/logo/PhonePe/PhonePe-Logo.wine.png"
-            elif "GPAY" in sender: 
-                method_name = "GPay"
-                icon_url = "https://upload.wikimedia.org/wikipedia/commons/thumb/f/f2/Google_Pay_Logo.svg/2560px-Google_Pay_Logo.svg.png"
-            elif "HDFC" in sender: 
-                method_name = "HDFC Bank"
-                icon_url = "https://www.hdfcbank.com/static/brand/logo.png"
-            elif "SBI" in sender: 
-                method_name = "SBI"
-                icon_url = "https://upload.wikimedia.org/wikipedia/en/thumb/5/58/State_Bank_of_India_logo.svg/1200px-State_Bank_of_India_logo.svg.png"
-            elif "ICICI" in sender: 
-                method_name = "ICICI Bank"
-                icon_url = "https://upload.wikimedia.org/wikipedia/commons/1/12/ICICI_Bank_Logo.svg"
-            elif "AXIS" in sender: 
-                method_name = "Axis Bank"
-                icon_url = "https://upload.wikimedia.org/wikipedia/commons/thumb/3/30/Axis_Bank_logo.svg/2560px-Axis_Bank_logo.svg.png"
-            elif "KOTAK" in sender: 
-                method_name = "Kotak Bank"
-                icon_url = "https://upload.wikimedia.org/wikipedia/en/thumb/8/8f/Kotak_Mahindra_Bank_logo.svg/1200px-Kotak_Mahindra_Bank_logo.svg.png"
-            else:
-                method_name = "UPI"
-                icon_url = ""            
-            
-            payment_method, created = PaymentMethod.objects.get_or_create(name=method_name)
-            if created or not payment_method.icon:
-                payment_method.icon = icon_url
-                payment_method.save()
-
-            # Create Transaction for the user associated with sender (for now we still use first user for demo SMS, but ideally we'd link phone to user)
-            user = User.objects.first() # DEMO ONLY
-            if not user:
-                return JsonResponse({'status': 'error', 'message': 'No user available for SMS logging'}, status=400)
-
-            transaction = Transaction.objects.create(
-                user=user,
-                title=parsed.get('title', 'Unknown Merchant'),
-                amount=parsed.get('amount'),
-                transaction_type='expense',
-                category=category,
-                payment_method=payment_method,
-                date=timezone.now(),
-                description=f"Auto-logged from SMS: {sender}"
-            )
-            
-            return JsonResponse({'status': 'success', 'id': transaction.id}, status=201)
+        payload = request.body.decode('utf-8', errors='replace')
+
+        def queue():
+            # Only the raw body is stored here; `manage.py process_sms_inbox`
+            # parses and logs it, so a slow database can't time the sender out
+            entry = inbox.append(payload)
+            if entry.result is not None:
+                # Eager mode: processed within this request
+                return SMS_STATUS_CODES[entry.result['status']], entry.result
+            return 202, {'status': 'queued', 'id': entry.pk}
+
+        # Senders that don't send an Idempotency-Key are keyed on the message itself
+        digest = sms_request_hash(payload)
+        outcome = idempotency.execute('sms', idempotency.key_from(request) or digest, digest, queue)
+        response = JsonResponse(outcome.body, status=outcome.status)
+        if outcome.replayed:
+            response[idempotency.REPLAYED_HEADER] = 'true'
+        return response
 
-        except Exception as e:
-            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
-    
     return JsonResponse({'status': 'method_not_allowed'}, status=405)
 
+@csrf_exempt
+def sms_webhook_batch(request):
+    """
+    Batch variant of sms_webhook for apps flushing a backlog of messages:
+    {"messages": [{"body": "...", "sender": "HDFCBK"}, ...]}
+    Messages are parsed together and inserted in one transaction; the
+    response holds one {"index", "status", "id"/"message"} per message.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'method_not_allowed'}, status=405)
+    try:
+        messages = sms.messages_from(json.loads(request.body))
+    except (ValueError, sms.SmsBatchError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    user = User.objects.first() # DEMO ONLY, as in sms_webhook
+    if not user:
+        return JsonResponse({'status': 'error', 'message': 'No user available for SMS logging'}, status=400)
+
+    results = sms.ingest(user, messages)
+    return JsonResponse({
+        'status': 'success',
+        'created': sum(result['status'] == 'success' for result in results),
+        'results': [{'index': index, **result} for index, result in enumerate(results)],
+    })
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models.functions import TruncDate
 from django.utils import timezone
-from datetime import timedelta
 from .serializers import TransactionSerializer, CategorySerializer, PaymentMethodSerializer, SavingsGoalSerializer, MonthlyBudgetSerializer
 from .models import MonthlyBudget
 
@@ -239,11 +224,13 @@ def reset_data(request):
     """
     try:
         Transaction.objects.filter(user=request.user).delete()
+        ledger.transactions_reset(request.user)
         MonthlyBudget.objects.filter(user=request.user).delete()
         SavingsGoal.objects.filter(user=request.user).delete()
         
         # Optional: Reset category budget limits to 0
         Category.objects.update(budget_limit=0)
+        stats_cache.bump_reference_generation()
         
         return Response({'status': 'success', 'message': 'All data has been reset.'})
     except Exception as e:
@@ -253,14 +240,17 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.decorators import permission_classes
 from rest_framework import permissions
 from django.utils.html import escape, strip_tags
-from .utils import parse_federal_bank_statement
+from . import jobs, staging
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def upload_statement(request):
     """
     Endpoint strictly for uploading PDF bank statements securely.
-    Processes the file purely in-memory, discarding it immediately after.
+    Validates the file and queues it as an ImportJob; the stored copy is
+    discarded as soon as the worker has parsed it. With `preview` set the
+    parsed rows are only staged, to be reviewed and committed through
+    /api/statement-previews/<token>/.
     Currently specifically customized for Federal Bank statement formatting.
     """
     if 'file' not in request.FILES:
@@ -268,9 +258,12 @@ def upload_statement(request):
         
     uploaded_file = request.FILES['file']
     
-    # 1. Strict File Size Limit (max 5MB) to prevent DoS attacks
-    if uploaded_file.size > 5 * 1024 * 1024:
-        return Response({"error": "File too large. Maximum size is 5MB."}, status=status.HTTP_400_BAD_REQUEST)
+    # 1. Strict File Size Limit to prevent DoS attacks. Large uploads are
+    # already spooled to disk by Django and parsed page by page, so this
+    # bounds parsing time rather than memory
+    max_upload_mb = settings.STATEMENT_MAX_UPLOAD_MB
+    if uploaded_file.size > max_upload_mb * 1024 * 1024:
+        return Response({"error": f"File too large. Maximum size is {max_upload_mb}MB."}, status=status.HTTP_400_BAD_REQUEST)
 
     # 2. Content Type Validation
     if uploaded_file.content_type != 'application/pdf':
@@ -295,63 +288,29 @@ def upload_statement(request):
     if not uploaded_file.name.lower().endswith('.pdf'):
         return Response({"error": "Only PDF files are supported for parsing"}, status=status.HTTP_400_BAD_REQUEST)
 
-    try:
-        # Extract optional password from the request
-        pdf_password = request.data.get('password', '')
-        
-        # Pass the in-memory file to the parser securely encrypted with the user's password
-        parsed_transactions = parse_federal_bank_statement(uploaded_file, request.user, password=pdf_password)
-        
-        # We need a default category and payment method for statement uploads
-        default_cat, _ = Category.objects.get_or_create(name='General', defaults={'icon': 'FileText', 'budget_limit': 0})
-        default_method, _ = PaymentMethod.objects.get_or_create(name='Bank Transfer', defaults={'icon': 'Landmark'})
-        
-        created_count = 0
-        skipped_count = 0
-        
-        import re
-        
-        # Save them into the database securely
-        for tx_data in parsed_transactions:
-            # 5. Ultimate Sanitize Strings (Prevent XSS/Injection on title using strict ASCII matching)
-            # Remove all non-printable ASCII characters or hidden control codes
-            clean_title = strip_tags(tx_data['title'])[:255]
-            clean_title = re.sub(r'[^\x20-\x7E]', '', clean_title).strip()
-            
-            # 6. De-Duplication Logic (Prevent accidental double uploads of the same statement)
-            exists = Transaction.objects.filter(
-                user=request.user, 
-                title=clean_title, 
-                amount=tx_data['amount'], 
-                date=tx_data['date']
-            ).exists()
-            
-            if not exists:
-                # 7. Smart auto-mapping for transaction category
-                cat_name = tx_data.get('category_name', 'General')
-                category_obj, _ = Category.objects.get_or_create(name=cat_name, defaults={'icon': 'List', 'budget_limit': 0})
-                
-                Transaction.objects.create(
-                    user=request.user,
-                    title=clean_title,
-                    amount=tx_data['amount'],
-                    date=tx_data['date'],
-                    transaction_type=tx_data['transaction_type'],
-                    category=category_obj,
-                    payment_method=default_method
-                )
-                created_count += 1
-            else:
-                skipped_count += 1
-            
+    # 5. Identical files are parsed once: a preview of a file that's still
+    # staged is answered straight from the staging table
+    preview = str(request.data.get('preview', '')).lower() in ('1', 'true', 'yes')
+    file_path, file_hash = jobs.spool(uploaded_file, password=request.data.get('password', ''))
+    staged = staging.find(request.user, file_hash) if preview else None
+    if staged is not None:
+        jobs.discard(file_path)
         return Response({
-            "status": "success", 
-            "message": f"Successfully imported {created_count} transactions (Skipped {skipped_count} duplicates)."
+            "status": "staged",
+            "staging_token": staged.token,
+            "row_count": staged.row_count,
+            "message": jobs.preview_message(staged),
         })
-        
-    except Exception as e:
-        print("Upload statement error: ", str(e)) # Logs to stdout instead of returning traceback to user
-        return Response({"error": "Failed to safely parse document. Ensure the file is uncorrupted and format matches."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    # 6. Parsing (or reusing a staged copy) and importing happen in the
+    # process_import_jobs worker; the client polls /api/import-jobs/<id>/
+    job = jobs.enqueue(request.user, uploaded_file.name, file_path, file_hash, preview=preview)
+    return Response({
+        "status": job.status,
+        "job_id": job.pk,
+        "staging_token": job.staged.token if job.staged_id else None,
+        "message": job.message or "Statement queued for import.",
+    }, status=status.HTTP_202_ACCEPTED)
 
 from .utils import parse_natural_language_expense
 
@@ -393,6 +352,7 @@ def parse_smart_text(request):
             category=category_obj,
             payment_method=default_method
         )
+        ledger.transactions_changed(request.user, added=[txn])
         
         return Response({
             'status': 'success',
@@ -421,161 +381,139 @@ class MonthlyBudgetView(viewsets.ViewSet):
 
 class TransactionViewSet(viewsets.ModelViewSet):
     serializer_class = TransactionSerializer
+    pagination_class = TransactionCursorPagination
+    filter_backends = [TransactionFilterBackend]
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [CompactJSONRenderer]
+
     def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user).order_by('-date')
+        queryset = (
+            Transaction.objects.filter(user=self.request.user)
+            .select_related('category', 'payment_method')
+            .order_by('-date', '-id')
+        )
+        if self.action == 'list':
+            # List rows don't carry the free-text description
+            queryset = queryset.defer('description')
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return TransactionListSerializer
+        return super().get_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'compact':
+            return super().list(request, *args, **kwargs)
+
+        # Compact mode: ids per row plus one side-loaded dictionary of the
+        # categories and payment methods the rows actually reference
+        queryset = self.filter_queryset(self.get_queryset()).select_related(None)
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+
+        category_ids = {row.category_id for row in rows if row.category_id}
+        method_ids = {row.payment_method_id for row in rows if row.payment_method_id}
+        side_loaded = {
+            'categories': {
+                category['id']: category
+                for category in CategorySerializer(Category.objects.filter(id__in=category_ids), many=True).data
+            } if category_ids else {},
+            'payment_methods': {
+                method['id']: method
+                for method in PaymentMethodSerializer(PaymentMethod.objects.filter(id__in=method_ids), many=True).data
+            } if method_ids else {},
+        }
+
+        data = CompactTransactionSerializer(rows, many=True).data
+        if page is not None:
+            response = self.get_paginated_response(data)
+            response.data.update(side_loaded)
+            return response
+        return Response({'results': data, **side_loaded})
+
+    def create(self, request, *args, **kwargs):
+        key = idempotency.key_from(request)
+        if key is None:
+            return super().create(request, *args, **kwargs)
+
+        def create_once():
+            response = super(TransactionViewSet, self).create(request, *args, **kwargs)
+            return response.status_code, response.data
+
+        # A retried POST with the same Idempotency-Key gets the first response back
+        outcome = idempotency.execute(f"transactions:{request.user.pk}", key, idempotency.request_hash(request.data), create_once)
+        headers = {idempotency.REPLAYED_HEADER: 'true'} if outcome.replayed else None
+        return Response(outcome.body, status=outcome.status, headers=headers)
 
     def perform_create(self, serializer):
         transaction = serializer.save(user=self.request.user)
-        
-        # Budget Check Logic
-        if hasattr(self.request.user, 'monthlybudget'):
-            monthly_budget = self.request.user.monthlybudget.amount
-            if monthly_budget > 0 and transaction.transaction_type == 'expense':
-                user = self.request.user
-                current_month = timezone.now().month
-                current_year = timezone.now().year
-                
-                total_expenses = Transaction.objects.filter(
-                    user=user, 
-                    transaction_type='expense',
-                    date__month=current_month, 
-                    date__year=current_year
-                ).aggregate(Sum('amount'))['amount__sum'] or 0
-                
-                percentage = (total_expenses / monthly_budget) * 100
-                
-                if percentage >= 100:
-                    if not Notification.objects.filter(
-                        user=user, 
-                        title='Budget Exceeded!', 
-                        created_at__date=timezone.now().date()
-                    ).exists():
-                         Notification.objects.create(
-                            user=user,
-                            title='Budget Exceeded!',
-                            message=f"You've exceeded your monthly budget of {monthly_budget}!",
-                            notification_type='error'
-                        )
-                elif percentage >= 80:
-                    if not Notification.objects.filter(
-                        user=user, 
-                        title='Budget Alert', 
-                        created_at__date=timezone.now().date()
-                    ).exists():
-                        Notification.objects.create(
-                            user=user,
-                            title='Budget Alert',
-                            message=f"Heads up! You've used {int(percentage)}% of your monthly budget.",
-                            notification_type='warning'
-                        )
+        # Rollups, the month-to-date counter and budget alerts are all
+        # maintained by the ledger
+        ledger.transactions_changed(self.request.user, added=[transaction])
+
+    def perform_update(self, serializer):
+        before = copy.copy(serializer.instance)
+        transaction = serializer.save()
+        ledger.transactions_changed(self.request.user, added=[transaction], removed=[before])
+        merchants.learn(self.request.user, merchants.recategorized([before], [transaction]))
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        ledger.transactions_changed(self.request.user, removed=[instance])
+
+    def get_rollups(self):
+        return DailyRollup.objects.filter(user=self.request.user)
 
     @action(detail=False, methods=['get'])
+    @stats_cache.cached_stats('dashboard_stats')
     def dashboard_stats(self, request):
-        transactions = self.get_queryset()
+        # Balance, income, expense, month change and the weekly chart all
+        # come out of a single conditional aggregate over the rollups
+        summary = aggregates.summarize(request.user)
         
-        income = transactions.filter(transaction_type='income').aggregate(Sum('amount'))['amount__sum'] or 0
-        expense = transactions.filter(transaction_type='expense').aggregate(Sum('amount'))['amount__sum'] or 0
-        balance = income - expense
-        
-        recent_transactions = transactions[:5]
+        recent_transactions = self.get_queryset().select_related('category', 'payment_method')[:5]
         recent_serializer = self.get_serializer(recent_transactions, many=True)
 
-        # Weekly Spending Logic (Last 7 days)
-        today = timezone.now().date()
-        start_date = today - timedelta(days=6)
-        
-        daily_stats = (
-            transactions.filter(
-                transaction_type='expense',
-                date__date__range=[start_date, today]
-            )
-            .annotate(date_only=TruncDate('date'))
-            .values('date_only')
-            .annotate(total=Sum('amount'))
-            .order_by('date_only')
-        )
-        
         # Format for frontend: Ensure all 7 days are present, default to 0
         weekly_spending = []
-        stats_dict = {str(item['date_only']): item['total'] for item in daily_stats}
-        
-        for i in range(7):
-            current_date = start_date + timedelta(days=i)
-            day_name = current_date.strftime('%a') # Mon, Tue, etc.
-            date_str = str(current_date)
-            amount = stats_dict.get(date_str, 0)
+        for current_date, amount in summary['weekly_spending']:
             weekly_spending.append({
-                "day": day_name,
+                "day": current_date.strftime('%a'), # Mon, Tue, etc.
                 "amount": amount,
-                "full_date": date_str
+                "full_date": str(current_date)
             })
         
-        # Calculate total budget from MonthlyBudget model
-        monthly_budget, _ = MonthlyBudget.objects.get_or_create(user=request.user)
-        total_budget = monthly_budget.amount
+        # Read the budget without get_or_create so a plain GET never writes
+        total_budget = MonthlyBudget.objects.filter(user=request.user).values_list('amount', flat=True).first() or 0
 
         return Response({
-            "balance": balance,
-            "income": income,
-            "expense": expense,
+            "balance": summary['balance'],
+            "income": summary['income'],
+            "expense": summary['expense'],
             "recent_transactions": recent_serializer.data,
             "weekly_spending": weekly_spending,
-            "month_change": self.calculate_monthly_change(transactions),
+            "month_change": summary['month_change'],
             "total_budget": float(total_budget)
         })
 
-    def calculate_monthly_change(self, transactions):
-        today = timezone.now().date()
-        first_day_current_month = today.replace(day=1)
-        
-        # Balance at the start of the current month (Opening Balance)
-        # = Total Income before this month - Total Expense before this month
-        opening_income = transactions.filter(
-            transaction_type='income',
-            date__date__lt=first_day_current_month
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
-        
-        opening_expense = transactions.filter(
-            transaction_type='expense',
-            date__date__lt=first_day_current_month
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
-        
-        opening_balance = opening_income - opening_expense
-        
-        # Current Balance
-        current_income = transactions.filter(transaction_type='income').aggregate(Sum('amount'))['amount__sum'] or 0
-        current_expense = transactions.filter(transaction_type='expense').aggregate(Sum('amount'))['amount__sum'] or 0
-        current_balance = current_income - current_expense
-        
-        # If opening balance is 0, any positive balance is 100% growth
-        if opening_balance == 0:
-            if current_balance > 0:
-                return 100
-            elif current_balance < 0:
-                return -100
-            else:
-                return 0
-
-        # Calculate percentage change
-        change = ((current_balance - opening_balance) / abs(opening_balance)) * 100
-        return round(change, 1)
-
     @action(detail=False, methods=['post'])
     def reset_data(self, request):
         """
         Deletes all transactions to reset the dashboard.
         """
         self.get_queryset().delete()
+        ledger.transactions_reset(request.user)
         return Response({'status': 'success', 'message': 'All transactions deleted'})
 
     @action(detail=False, methods=['get'])
+    @stats_cache.cached_stats('analytics_stats')
     def analytics_stats(self, request):
-        transactions = self.get_queryset().filter(transaction_type='expense')
+        rollups = self.get_rollups().filter(transaction_type='expense')
         
         # 1. Category Distribution
         category_stats = (
-            transactions.values('category__name', 'category__icon')
-            .annotate(value=Sum('amount'))
+            rollups.values('category__name', 'category__icon')
+            .annotate(value=Sum('total'))
             .order_by('-value')
         )
         category_distribution = [
@@ -586,32 +524,18 @@ class TransactionViewSet(viewsets.ModelViewSet):
             } for item in category_stats
         ]
 
-        # 2. Monthly Trend (Last 6 months)
-        six_months_ago = timezone.now().date().replace(day=1) - timedelta(days=150)
-        monthly_stats = (
-            transactions.filter(date__date__gte=six_months_ago)
-            .annotate(month=TruncDate('date')) # We'll group by month in Python for better control
-            .values('month', 'amount')
-        )
-        
-        # Group by month string (e.g., "Jan")
-        trends_dict = {}
-        for item in monthly_stats:
-            month_name = item['month'].strftime('%b')
-            trends_dict[month_name] = trends_dict.get(month_name, 0) + float(item['amount'])
-            
-        # Ensure last 6 months are present in order
-        monthly_trend = []
-        for i in range(5, -1, -1):
-            target_date = timezone.now().date().replace(day=1) - timedelta(days=i*30)
-            month_name = target_date.strftime('%b')
-            monthly_trend.append({
-                "month": month_name,
-                "amount": trends_dict.get(month_name, 0)
-            })
+        # 2. Monthly Trend (Last 6 calendar months, bucketed in the database)
+        today = timezone.localdate()
+        monthly_trend = [
+            {
+                "month": bucket['period'].strftime('%b'),
+                "amount": float(bucket['amount'])
+            } for bucket in aggregates.time_series(request.user, aggregates.range_start('6m', today), today)
+        ]
 
         # 3. Summary
-        total_spent = transactions.aggregate(Sum('amount'))['amount__sum'] or 0
+        summary = aggregates.summarize(request.user)
+        total_spent = summary['expense']
         avg_daily = total_spent / 30 # Rough estimate for current month
         
         return Response({
@@ -620,10 +544,114 @@ class TransactionViewSet(viewsets.ModelViewSet):
             "summary": {
                 "total_spent": float(total_spent),
                 "avg_daily": float(avg_daily),
-                "transaction_count": transactions.count()
+                "transaction_count": summary['expense_count']
             }
         })
 
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Applies many create/update/delete operations in one transaction:
+        {"operations": [{"op": "create", "data": {...}},
+                        {"op": "update", "id": 12, "data": {...}},
+                        {"op": "delete", "id": 13}]}
+        Nothing is written unless every operation validates.
+        """
+        try:
+            applied, results = batch.apply_batch(request.user, request.data, self.get_serializer_context())
+        except batch.BatchError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not applied:
+            return Response({'status': 'error', 'results': results}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'status': 'success', 'results': results})
+
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """
+        Streams the user's transactions as CSV (default) or ?format=ndjson,
+        honouring the same filters as the list endpoint.
+        """
+        queryset = filter_transactions(self.get_queryset(), request.query_params)
+
+        if request.accepted_renderer.format == 'ndjson':
+            response = StreamingHttpResponse(exports.stream_ndjson(queryset), content_type='application/x-ndjson')
+            filename = 'transactions.ndjson'
+        else:
+            response = StreamingHttpResponse(exports.stream_csv(queryset), content_type='text/csv')
+            filename = 'transactions.csv'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Ranked full-text search over titles and descriptions: ?q=swiggy&limit=20
+        """
+        query = request.query_params.get('q', '').strip()
+        if not search.search_terms(query):
+            return Response({'error': 'Please provide a search query'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', search.MAX_RESULTS))
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = search.search_transactions(request.user, query, limit)
+        return Response(TransactionSerializer(results, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    @stats_cache.cached_stats('timeseries')
+    def timeseries(self, request):
+        """
+        Calendar-bucketed totals for charts.
+        Query params: granularity (day|week|month|year), range (7d|30d|90d|6m|12m|5y)
+        or start/end as YYYY-MM-DD, type (expense|income), split (category|payment_method).
+        """
+        granularity = request.query_params.get('granularity', 'month')
+        transaction_type = request.query_params.get('type', 'expense')
+        split = request.query_params.get('split')
+        range_key = request.query_params.get('range', '6m')
+
+        if granularity not in aggregates.GRANULARITIES:
+            return Response({'error': 'granularity must be one of day, week, month, year'}, status=status.HTTP_400_BAD_REQUEST)
+        if transaction_type not in dict(Transaction.TRANSACTION_TYPES):
+            return Response({'error': 'type must be expense or income'}, status=status.HTTP_400_BAD_REQUEST)
+        if split and split not in aggregates.SPLITS:
+            return Response({'error': 'split must be category or payment_method'}, status=status.HTTP_400_BAD_REQUEST)
+
+        today = timezone.localdate()
+        try:
+            if 'start' in request.query_params:
+                start = datetime.date.fromisoformat(request.query_params['start'])
+                end = datetime.date.fromisoformat(request.query_params.get('end', str(today)))
+            elif range_key in aggregates.RANGES:
+                start, end = aggregates.range_start(range_key, today), today
+            else:
+                return Response({'error': 'Unknown range'}, status=status.HTTP_400_BAD_REQUEST)
+            buckets = aggregates.bucket_count(start, end, granularity)
+        except (ValueError, OverflowError):
+            return Response({'error': 'start and end must be YYYY-MM-DD dates'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if start > end:
+            return Response({'error': 'start must not be after end'}, status=status.HTTP_400_BAD_REQUEST)
+        if buckets > aggregates.MAX_BUCKETS:
+            return Response({'error': 'Too many buckets, use a coarser granularity'}, status=status.HTTP_400_BAD_REQUEST)
+
+        series = aggregates.time_series(request.user, start, end, granularity, transaction_type, split)
+        return Response({
+            "granularity": granularity,
+            "start": str(start),
+            "end": str(end),
+            "series": [
+                {
+                    "period": str(bucket['period']),
+                    "amount": float(bucket['amount']),
+                    "count": bucket['count'],
+                    **({"split": {name: float(value) for name, value in bucket['split'].items()}} if split else {})
+                } for bucket in series
+            ]
+        })
+
 class CategoryViewSet(viewsets.ModelViewSet):
     serializer_class = CategorySerializer
 
@@ -632,30 +660,36 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return Category.objects.all()
 
     @action(detail=False, methods=['get'])
+    @stats_cache.cached_stats('budget_stats')
     def budget_stats(self, request):
-        today = timezone.now().date()
-        first_day = today.replace(day=1)
-        
-        categories = self.get_queryset()
-        stats = []
-        
-        for category in categories:
-            # Calculate total spent for this category in current month FOR THIS USER
-            spent = Transaction.objects.filter(
-                user=request.user,
-                category=category,
-                transaction_type='expense',
-                date__date__gte=first_day
-            ).aggregate(Sum('amount'))['amount__sum'] or 0
+        """
+        Per-category spend against budget for the current month,
+        or for ?month=YYYY-MM.
+        """
+        month_param = request.query_params.get('month')
+        try:
+            if month_param:
+                first_day = datetime.datetime.strptime(month_param, '%Y-%m').date()
+            else:
+                first_day = timezone.localdate().replace(day=1)
+            # Raises for December 9999, which has no following month to count back from
+            last_day = aggregates.add_months(first_day, 1) - datetime.timedelta(days=1)
+        except ValueError:
+            return Response({'error': 'month must be formatted as YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
 
-            
+        # One grouped query for this user's spend, joined in Python against
+        # the cached category list instead of one aggregate per category
+        spent_by_category = aggregates.category_spend(request.user, first_day, last_day)
+
+        stats = []
+        for category in stats_cache.reference_categories():
             stats.append({
-                'id': category.id,
-                'category': category.name,
-                'amount': float(spent),
-                'budget': float(category.budget_limit),
-                'color': category.icon or '#6B7280', # Use icon as color placeholder for now if needed, or add color field later
-                'icon': category.icon
+                'id': category['id'],
+                'category': category['name'],
+                'amount': float(spent_by_category.get(category['id'], 0)),
+                'budget': float(category['budget_limit']),
+                'color': category['icon'] or '#6B7280', # Use icon as color placeholder for now if needed, or add color field later
+                'icon': category['icon']
             })
             
         return Response(stats)
@@ -752,8 +786,51 @@ class NotificationViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
-        self.get_queryset().update(is_read=True)
+        self.get_queryset().filter(is_read=False).update(is_read=True)
         return Response({'status': 'success'})
 
+class ImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Status and result of queued statement imports, polled by the client."""
+    serializer_class = ImportJobSerializer
+
+    def get_queryset(self):
+        return ImportJob.objects.filter(user=self.request.user).select_related('staged').order_by('-created_at')
+
+class StatementPreviewViewSet(mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Staged statement rows from a preview upload. GET pages through the rows
+    (?offset=&limit=) flagging the ones an import would skip, POST commit/
+    imports them without re-parsing, DELETE discards the preview.
+    """
+    serializer_class = StagedStatementSerializer
+    lookup_field = 'token'
+    preview_page_size = 500
+
+    def get_queryset(self):
+        return staging.live(self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        staged = self.get_object()
+        try:
+            offset = max(0, int(request.query_params.get('offset', 0)))
+            limit = min(max(1, int(request.query_params.get('limit', self.preview_page_size))), self.preview_page_size)
+        except ValueError:
+            return Response({'error': 'offset and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = self.get_serializer(staged).data
+        data['rows'] = mark_duplicates(request.user, staging.staged_rows(staged, offset=offset, limit=limit))
+        return Response(data)
+
+    @action(detail=True, methods=['post'])
+    def commit(self, request, token=None):
+        staged = self.get_object()
+        created_count, skipped_count = jobs.commit(request.user, staged)
+        return Response({
+            'status': 'success',
+            'created_count': created_count,
+            'skipped_count': skipped_count,
+            'message': jobs.import_message(created_count, skipped_count),
+        })
+
 
 
@@ -0,0 +1,21 @@
+#!/usr/bin/env bash
+# Container entry point: the web server plus the statement import and SMS
+# inbox workers. If any of the three exits, the others are stopped and the
+# container exits with its status, so the platform's restart policy brings
+# everything back instead of leaving a dead worker behind a live web server.
+set -eu
+
+python manage.py migrate
+python manage.py seed_data
+
+trap 'exit 143' TERM INT
+trap 'kill $(jobs -p) 2>/dev/null; wait' EXIT
+
+python manage.py process_import_jobs &
+python manage.py process_sms_inbox &
+gunicorn --bind 0.0.0.0:8000 expense_tracker.wsgi:application &
+
+status=0
+wait -n || status=$?
+echo "start.sh: a process exited with status $status, stopping the container" >&2
+exit "$status"
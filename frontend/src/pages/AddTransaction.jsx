@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { ChevronLeft, Calendar, FileText, Check, CreditCard, Wallet, Banknote, Smartphone } from 'lucide-react';
 import { useNavigate, useSearchParams } from 'react-router-dom';
 import * as LucideIcons from 'lucide-react';
@@ -25,6 +25,10 @@ const AddTransaction = () => {
     const [loading, setLoading] = useState(true);
     const [saving, setSaving] = useState(false);
 
+    // One Idempotency-Key per form state, so re-submitting after a network
+    // error can't save the same transaction twice
+    const idempotency = useRef({ form: null, key: null });
+
     useEffect(() => {
         const fetchData = async () => {
             try {
@@ -81,7 +85,13 @@ const AddTransaction = () => {
                 description
             };
 
-            await api.post('/transactions/', payload);
+            const form = JSON.stringify([title, amount, type, category?.id, paymentMethod?.id, date, description]);
+            if (idempotency.current.form !== form) {
+                const key = window.crypto?.randomUUID ? window.crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+                idempotency.current = { form, key };
+            }
+
+            await api.post('/transactions/', payload, { headers: { 'Idempotency-Key': idempotency.current.key } });
             navigate('/');
         } catch (err) {
             console.error("Failed to save transaction", err);
@@ -5,10 +5,16 @@ import { useNavigate } from 'react-router-dom';
 import api from '../api';
 import LoadingSpinner from '../components/LoadingSpinner';
 
+// Import jobs are polled this often, for at most POLL_LIMIT rounds (~2 minutes)
+const POLL_INTERVAL_MS = 1500;
+const POLL_LIMIT = 80;
+
 const Transactions = () => {
   const navigate = useNavigate();
   const fileInputRef = useRef(null);
+  const unmounted = useRef(false);
   const [uploading, setUploading] = useState(false);
+  const [pendingImport, setPendingImport] = useState(null);
   const [transactions, setTransactions] = useState([]);
   const [loading, setLoading] = useState(true);
   const [stats, setStats] = useState({
@@ -34,6 +40,12 @@ const Transactions = () => {
     fetchTransactions();
   }, [fetchTransactions]);
 
+  // Stops upload polling when the page is left
+  useEffect(() => {
+    unmounted.current = false;
+    return () => { unmounted.current = true; };
+  }, []);
+
   const calculateStats = (data) => {
     const expenses = data.filter(t => t.transaction_type === 'expense');
     const totalSpent = expenses.reduce((sum, t) => sum + parseFloat(t.amount), 0);
@@ -128,13 +140,32 @@ const Transactions = () => {
           'Content-Type': 'multipart/form-data',
         }
       });
-      alert(response.data.message);
+      // The statement is parsed in the background; poll the job until it
+      // settles, the page is left or the poll limit is reached
+      let job = response.data;
+      const jobId = job.job_id ?? job.id;
+      const busy = () => job.status === 'queued' || job.status === 'running';
+      for (let attempt = 0; busy() && attempt < POLL_LIMIT; attempt++) {
+        await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+        if (unmounted.current) return;
+        // Timestamped URL so the GET cache in api.js doesn't replay a stale status
+        const poll = await api.get(`/import-jobs/${jobId}/?_=${Date.now()}`);
+        job = poll.data;
+      }
+      if (unmounted.current) return;
+      if (busy()) {
+        setPendingImport('Your statement is still being processed. Check back later to see the imported transactions.');
+        return;
+      }
+      setPendingImport(null);
+      alert(job.message);
       fetchTransactions(); // Refresh the list
     } catch (err) {
+      if (unmounted.current) return;
       console.error('Failed to upload statement:', err);
       alert(err.response?.data?.error || 'Failed to process statement. Please try again.');
     } finally {
-      setUploading(false);
+      if (!unmounted.current) setUploading(false);
       // Reset file input
       if (fileInputRef.current) {
         fileInputRef.current.value = '';
@@ -203,6 +234,18 @@ const Transactions = () => {
         </div>
       </div>
 
+      {pendingImport && (
+        <div className="mx-6 mt-4 p-4 flex items-start justify-between gap-3 rounded-2xl bg-amber-50 dark:bg-amber-900/20 border border-amber-200 dark:border-amber-800 text-sm text-amber-800 dark:text-amber-200">
+          <span>{pendingImport}</span>
+          <button
+            onClick={() => { setPendingImport(null); fetchTransactions(); }}
+            className="font-semibold whitespace-nowrap hover:underline"
+          >
+            Refresh
+          </button>
+        </div>
+      )}
+
       {/* Highlights */}
       <div className="px-6 mt-6">
         <h2 className="text-base font-semibold text-gray-900 dark:text-white mb-4">Monthly highlights</h2>